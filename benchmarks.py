@@ -0,0 +1,255 @@
+"""
+Performance benchmarks for the maze environment.
+
+Measures step throughput, reset latency, maze generation, maze encoding and decoding,
+rgb_array rendering and peak memory per environment over a range of grid sizes, and
+the cold start time of a new process once, and writes the results as JSON. Results
+can be compared against a saved baseline to flag regressions, e.g.
+
+    python benchmarks.py --output baseline.json
+    python benchmarks.py --output results.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.dungeonworld_grid import MazeGrid, generate_maze
+from envs.simple_dungeonworld_env import DungeonMazeEnv
+
+DEFAULT_SIZES = [8, 16, 32, 64, 128, 256, 512]
+
+# Unit of each benchmark and whether higher values are better
+BENCHMARKS = {
+    "step_throughput": ("steps/s", True),
+    "reset_latency": ("s", False),
+    "generate_maze": ("s", False),
+    "encode_maze_to_array": ("s", False),
+    "decode_maze_from_array": ("s", False),
+    "render_fps_pygame": ("frames/s", True),
+    "render_fps_numpy": ("frames/s", True),
+    "peak_memory_per_env": ("bytes", False),
+    "startup_time": ("s", False),
+}
+
+# Benchmarks that do not depend on the grid size, run once and stored under this size
+SIZE_INDEPENDENT = {"startup_time"}
+ANY_SIZE = "any"
+
+# Run in a fresh interpreter by the startup benchmark, like a new pool worker.
+# Resetting is left to the reset benchmark.
+STARTUP_SCRIPT = """
+from envs.simple_dungeonworld_env import DungeonMazeEnv
+env = DungeonMazeEnv()
+"""
+
+
+def time_call(function, min_time, repeats=3):
+    """
+    Returns the mean time of one call to `function`, taking the best of `repeats` rounds
+    that each call it for at least `min_time` seconds.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def bench_step_throughput(size, min_time):
+    env = DungeonMazeEnv(grid_size=size)
+    env.reset(seed=0)
+    actions = np.random.default_rng(0).integers(0, 3, size=1000).tolist()
+
+    def run_steps():
+        for action in actions:
+            terminated = env.step(action)[2]
+            if terminated:
+                env.reset()
+
+    return len(actions) / time_call(run_steps, min_time)
+
+
+def bench_reset_latency(size, min_time):
+    env = DungeonMazeEnv(grid_size=size)
+    env.reset(seed=0)
+    return time_call(env.reset, min_time)
+
+
+def bench_generate_maze(size, min_time):
+    np_rng = np.random.default_rng(0)
+    return time_call(lambda: generate_maze(size, np_rng), min_time)
+
+
+def bench_encode_maze_to_array(size, min_time):
+    maze = MazeGrid(size, empty=False, np_rng=np.random.default_rng(0))
+    return time_call(maze.encode_maze_to_array, min_time)
+
+
+def bench_decode_maze_from_array(size, min_time):
+    array = MazeGrid(size, empty=False, np_rng=np.random.default_rng(0)).cells
+    return time_call(lambda: MazeGrid.decode_maze_from_array(array), min_time)
+
+
+def _bench_render_fps(size, min_time, render_backend):
+    env = DungeonMazeEnv(
+        render_mode="rgb_array", grid_size=size, render_backend=render_backend
+    )
+    env.reset(seed=0)
+
+    def render_step():
+        env.step(0)
+        env.render()
+
+    return 1 / time_call(render_step, min_time)
+
+
+def bench_render_fps_pygame(size, min_time):
+    return _bench_render_fps(size, min_time, "pygame")
+
+
+def bench_render_fps_numpy(size, min_time):
+    return _bench_render_fps(size, min_time, "numpy")
+
+
+def bench_peak_memory_per_env(size, min_time):
+    tracemalloc.start()
+    env = DungeonMazeEnv(grid_size=size)
+    env.reset(seed=0)
+    for action in np.random.default_rng(0).integers(0, 3, size=100).tolist():
+        env.step(action)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_startup_time(min_time):
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    return time_call(
+        lambda: subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT], cwd=repo_dir, check=True
+        ),
+        min_time,
+    )
+
+
+def run_benchmarks(sizes, names, min_time):
+    """
+    Runs the named benchmarks for every grid size, returning {name: {size: value}}.
+    Benchmarks that do not depend on the grid size are run once, under `ANY_SIZE`.
+    """
+    results = {}
+    for name in names:
+        bench = globals()[f"bench_{name}"]
+        results[name] = {}
+        if name in SIZE_INDEPENDENT:
+            runs = [(ANY_SIZE, lambda: bench(min_time))]
+        else:
+            runs = [(size, lambda size=size: bench(size, min_time)) for size in sizes]
+        for size, run in runs:
+            value = run()
+            results[name][str(size)] = value
+            unit = BENCHMARKS[name][0]
+            print(f"{name:>24} size {size:>4}: {value:.6g} {unit}", flush=True)
+    return results
+
+
+def relative_change(value, baseline_value, higher_is_better):
+    """
+    Returns how much better `value` is than the baseline as a fraction, negative if it
+    is worse. A change from zero is infinitely better or 100% worse.
+    """
+    if higher_is_better:
+        better, worse = value, baseline_value
+    else:
+        better, worse = baseline_value, value
+    if worse == 0:
+        return 0.0 if better == 0 else float("inf")
+    return better / worse - 1
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compares results against a baseline, returning the list of regressions, i.e.
+    benchmarks more than `tolerance` (a fraction) worse than the baseline.
+    """
+    regressions = []
+    for name, values in results.items():
+        higher_is_better = BENCHMARKS[name][1]
+        for size, value in values.items():
+            baseline_value = baseline.get(name, {}).get(size)
+            if baseline_value is None:
+                continue
+            change = relative_change(value, baseline_value, higher_is_better)
+            flag = "REGRESSION" if change < -tolerance else ""
+            print(f"{name:>24} size {size:>4}: {change:+8.1%} {flag}")
+            if flag:
+                regressions.append((name, size, baseline_value, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS)
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="minimum seconds to spend on each timing round",
+    )
+    parser.add_argument("--output", help="file to write the JSON results to")
+    parser.add_argument("--compare", help="JSON results of a baseline to compare to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fraction a benchmark may be worse than the baseline before it is flagged",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "units": {name: BENCHMARKS[name][0] for name in args.benchmarks},
+        },
+        "results": run_benchmarks(args.sizes, args.benchmarks, args.min_time),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(
+            results["results"], baseline["results"], args.tolerance
+        )
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
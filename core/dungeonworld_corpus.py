@@ -0,0 +1,165 @@
+"""
+Corpus of pre-generated mazes stored in a single memory-mapped file.
+
+The file starts with a fixed size header,
+
+    magic (4 bytes)  b"DMZC"
+    version          uint8
+    packed           uint8, 1 if each maze is stored with one bit per cell
+    size             uint32, grid size of every maze
+    count            uint64, number of mazes
+    algorithm        16 bytes, the `generate_maze` algorithm (empty if unknown)
+    has_seed         uint8, 1 if the corpus was generated from a seed
+    seed             32 bytes, little-endian unsigned seed given to `generate_mazes`
+
+followed at `HEADER_SIZE` bytes by the mazes, one after another. Each maze is its wall
+array from `generate_maze` in C order, either as uint8 bytes or packed eight cells
+per byte with `np.packbits`.
+"""
+
+import struct
+
+import numpy as np
+
+from .dungeonworld_grid import MazeGrid, generate_mazes
+
+MAGIC = b"DMZC"
+VERSION = 1
+HEADER_FORMAT = "<4sBBxxIQ16sB32s"
+HEADER_SIZE = 128
+
+# Number of mazes generated at a time when building a corpus
+BUILD_CHUNK_SIZE = 65536
+
+
+def _maze_nbytes(size, packed):
+    """
+    Number of bytes used to store a single maze.
+    """
+    if packed:
+        return (size * size + 7) // 8
+    return size * size
+
+
+def _encode_header(size, count, packed, seed, algorithm):
+    """
+    Packs the corpus header into `HEADER_SIZE` bytes.
+    """
+    seed_bytes = (0 if seed is None else seed).to_bytes(32, "little")
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        int(packed),
+        size,
+        count,
+        (algorithm or "").encode("ascii"),
+        int(seed is not None),
+        seed_bytes,
+    )
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def _encode_mazes(walls, packed):
+    """
+    Flattens an (n, size, size) array of maze walls into the rows stored in the corpus.
+    """
+    walls = walls.reshape(len(walls), -1).astype(np.uint8)
+    if packed:
+        return np.packbits(walls, axis=1)
+    return walls
+
+
+def write_maze_corpus(path, walls, seed=None, algorithm=None, packed=True):
+    """
+    Writes an (n, size, size) array of maze walls to a corpus file at `path`.
+    `seed` and `algorithm` record how the mazes were generated.
+    """
+    count, size, _ = walls.shape
+    with open(path, "wb") as f:
+        f.write(_encode_header(size, count, packed, seed, algorithm))
+        f.write(_encode_mazes(walls, packed).tobytes())
+
+
+def build_maze_corpus(
+    path, n, size, seed, algorithm="fast_dfs", processes=None, packed=True
+):
+    """
+    Generates `n` mazes with `generate_mazes` and writes them to a corpus file at `path`.
+    Maze i of the corpus is maze i of the stream generated from `seed`.
+    """
+    if seed is None:
+        # Record the entropy used so the corpus can be regenerated
+        seed = np.random.SeedSequence().entropy
+    with open(path, "wb") as f:
+        f.write(_encode_header(size, n, packed, seed, algorithm))
+        for start in range(0, n, BUILD_CHUNK_SIZE):
+            walls = generate_mazes(
+                min(BUILD_CHUNK_SIZE, n - start),
+                size,
+                seed,
+                algorithm=algorithm,
+                processes=processes,
+                start=start,
+            )
+            f.write(_encode_mazes(walls, packed).tobytes())
+    return MazeCorpus(path)
+
+
+class MazeCorpus:
+    """
+    Read-only view of a maze corpus file. The mazes are memory-mapped, so opening a corpus
+    is cheap and processes using the same file share its pages through the page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        assert len(header) == HEADER_SIZE, f"Maze corpus {path} is truncated"
+
+        magic, version, packed, size, count, algorithm, has_seed, seed = struct.unpack(
+            HEADER_FORMAT, header[: struct.calcsize(HEADER_FORMAT)]
+        )
+        assert magic == MAGIC, f"{path} is not a maze corpus"
+        assert version == VERSION, f"Unsupported maze corpus version {version}"
+
+        self.packed = bool(packed)
+        self.size = size
+        self.count = count
+        self.algorithm = algorithm.rstrip(b"\0").decode("ascii") or None
+        self.seed = int.from_bytes(seed, "little") if has_seed else None
+
+        self._data = np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="r",
+            offset=HEADER_SIZE,
+            shape=(count, _maze_nbytes(size, self.packed)),
+        )
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        # Only pickle the path, each process maps the file itself
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def get_walls(self, index):
+        """
+        Returns the wall array of maze `index`, laid out as in `generate_maze`.
+        """
+        assert index >= 0 and index < self.count
+        row = self._data[index]
+        if self.packed:
+            row = np.unpackbits(row, count=self.size * self.size)
+        return np.array(row).reshape(self.size, self.size)
+
+    def get_maze(self, index):
+        """
+        Returns maze `index` as a `MazeGrid` with the target at the maze exit.
+        """
+        return MazeGrid.from_walls(self.get_walls(index))
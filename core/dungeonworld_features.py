@@ -0,0 +1,130 @@
+"""
+Compact encodings of the robot's camera view, and their conversion back to images.
+
+The camera view is always the image of the object in front of the robot: empty, a wall,
+the target or one of the creature sprites in the atlas. So it can be sent as the pair
+(object type index, image id), 2 bytes, or as an embedding of the means of the 4x4
+blocks of the image, 25 values, instead of the 400 byte image.
+"""
+
+import numpy as np
+
+from .dungeonworld_grid import MazeGrid
+from .dungeonworld_objects import get_camera_view
+from .dungeonworld_sprites import NUM_SPRITES, SPRITE_SHAPE
+
+# Observation modes of `DungeonMazeEnv`, i.e. how the camera view is encoded
+OBSERVATION_MODES = ("image", "sprite_id", "embedding")
+
+# Shape of the blocks of pixels averaged for each value of an embedding
+EMBEDDING_BLOCK = (4, 4)
+EMBEDDING_SIZE = (SPRITE_SHAPE[0] // EMBEDDING_BLOCK[0]) * (
+    SPRITE_SHAPE[1] // EMBEDDING_BLOCK[1]
+)
+
+# Tables of every camera view and its embedding, built on first use
+_view_table = None
+_embedding_table = None
+_embedding_keys = None
+_embedding_view_ids = None
+
+
+def embed_camera_views(views):
+    """
+    Returns the embeddings of (..., 20, 20) uint8 camera views as (..., 25) uint8
+    arrays, the means of each 4x4 block of pixels rounded down.
+    """
+    views = np.asarray(views, dtype=np.uint16)
+    (height, block_height), (width, block_width) = [
+        (size // block, block) for size, block in zip(SPRITE_SHAPE, EMBEDDING_BLOCK)
+    ]
+    blocks = views.reshape(
+        views.shape[:-2] + (height, block_height, width, block_width)
+    ).sum(axis=(-3, -1))
+    embeddings = blocks // (block_height * block_width)
+    return embeddings.reshape(views.shape[:-2] + (EMBEDDING_SIZE,)).astype(np.uint8)
+
+
+def get_view_table():
+    """
+    Returns the read-only (object types, 100, 20, 20) table of the camera view for
+    every object type index and image id. Object types without an image id have the
+    same view for every id.
+    """
+    global _view_table
+    if _view_table is None:
+        _view_table = np.stack(
+            [
+                [
+                    get_camera_view(object_type, image_id)
+                    for image_id in range(NUM_SPRITES)
+                ]
+                if object_type in MazeGrid.CREATURE_TYPES
+                else [get_camera_view(object_type)] * NUM_SPRITES
+                for object_type in MazeGrid.OBJECT_TO_IDX
+            ]
+        )
+        _view_table.flags.writeable = False
+    return _view_table
+
+
+def get_embedding_table():
+    """
+    Returns the read-only (object types, 100, 25) table of the embedding of the camera
+    view for every object type index and image id, computed once from the atlas.
+    """
+    global _embedding_table
+    if _embedding_table is None:
+        _embedding_table = embed_camera_views(get_view_table())
+        _embedding_table.flags.writeable = False
+    return _embedding_table
+
+
+def camera_views_from_ids(view_ids):
+    """
+    Returns the camera views of (..., 2) pairs of object type index and image id.
+    """
+    view_ids = np.asarray(view_ids)
+    return get_view_table()[view_ids[..., 0], view_ids[..., 1]]
+
+
+def camera_views_from_embeddings(embeddings):
+    """
+    Returns the camera views with the given (..., 25) embeddings. Distinct camera views
+    have distinct embeddings, so the views are recovered exactly.
+    """
+    global _embedding_keys, _embedding_view_ids
+    if _embedding_keys is None:
+        keys = get_embedding_table().reshape(-1, EMBEDDING_SIZE)
+        keys = np.ascontiguousarray(keys).view(f"V{EMBEDDING_SIZE}").ravel()
+        _embedding_keys, _embedding_view_ids = np.unique(keys, return_index=True)
+
+    embeddings = np.asarray(embeddings, dtype=np.uint8)
+    shape = embeddings.shape[:-1]
+    keys = (
+        np.ascontiguousarray(embeddings.reshape(-1, EMBEDDING_SIZE))
+        .view(f"V{EMBEDDING_SIZE}")
+        .ravel()
+    )
+    found = np.searchsorted(_embedding_keys, keys).clip(max=len(_embedding_keys) - 1)
+    assert np.all(_embedding_keys[found] == keys), "Unknown camera view embedding"
+    views = get_view_table().reshape((-1,) + SPRITE_SHAPE)[_embedding_view_ids[found]]
+    return views.reshape(shape + SPRITE_SHAPE)
+
+
+def to_image_observation(observation):
+    """
+    Returns a copy of an observation (or of stacked observations) made in the
+    "sprite_id" or "embedding" observation mode, with the camera view image in place of
+    its compact encoding, as in the "image" mode.
+    """
+    observation = dict(observation)
+    if "robot_camera_view_id" in observation:
+        observation["robot_camera_view"] = camera_views_from_ids(
+            observation.pop("robot_camera_view_id")
+        )
+    elif "robot_camera_view_embedding" in observation:
+        observation["robot_camera_view"] = camera_views_from_embeddings(
+            observation.pop("robot_camera_view_embedding")
+        )
+    return observation
@@ -1,12 +1,77 @@
-import numpy as np
-
-from .dungeonworld_objects import Target, Wall, Orc, Wingedbat, Lizard
+import concurrent.futures
+import itertools
+import time
 
+import numpy as np
 
-def generate_maze(size, np_rng=None, seed=None):
+from .dungeonworld_objects import (
+    EMPTY_VIEW,
+    TARGET_VIEW,
+    WALL_VIEW,
+    Target,
+    Wall,
+    Orc,
+    Wingedbat,
+    Lizard,
+)
+from .dungeonworld_sprites import NUM_SPRITES
+
+
+# Direction vectors of the robot indexed by direction (see `Directions`),
+# pointing in the direction of forward movement
+DIRECTION_VECTORS = np.array(
+    [
+        # Up (negative Y)
+        (0, -1),
+        # Pointing right (positive X)
+        (1, 0),
+        # Down (positive Y)
+        (0, 1),
+        # Pointing left (negative X)
+        (-1, 0),
+    ]
+)
+
+# The same direction vectors as tuples of Python ints, for scalar code
+DIRECTION_DELTAS = tuple(map(tuple, DIRECTION_VECTORS.tolist()))
+
+# Possible directions to carve a passage in
+MAZE_DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+# All 24 orderings of the directions, so the fast generator can pick a random
+# order with a single draw rather than shuffling a list
+MAZE_DIRECTION_ORDERS = tuple(itertools.permutations(MAZE_DIRECTIONS))
+
+# Maze generation algorithms accepted by `generate_maze`
+MAZE_ALGORITHMS = ("dfs", "fast_dfs", "eller")
+
+
+def generate_maze(
+    size, np_rng=None, seed=None, algorithm="dfs", out=None, packed=False
+):
     """
     Maze generation using iterative randomised DFS from https://en.wikipedia.org/wiki/Maze_generation_algorithm
     Note that mazes have at least a one cell buffer wall around all walkable cells.
+
+    Returns a (size, size) uint8 array indexed as [x, y] where 1 is a wall and 0 is empty.
+    If `packed` is True, each [x] row is instead packed eight cells per byte with
+    `np.packbits`, giving a (size, (size + 7) // 8) array. The maze is written into `out`
+    if it is given, e.g. an `np.memmap` of that shape.
+
+    `algorithm` selects how the maze is generated:
+    - "dfs" shuffles the list of directions at every step. This is the generator used by
+      `DungeonMazeEnv`, so existing seeds keep producing the same mazes.
+    - "fast_dfs" draws the order of the directions for every step of the search in one call
+      and keeps the stack as flat integer cell indices. It is several times faster.
+    - "eller" builds the maze one row at a time with Eller's algorithm (see
+      `generate_maze_rows`), using memory proportional to `size` besides the output,
+      so it can generate mazes too large for the other algorithms.
+
+    Every algorithm is deterministic: the same seed (or generator state), size and
+    algorithm always give the same maze, whether or not it is packed or written into
+    `out`. Different algorithms give different mazes for the same seed. The order in
+    which an algorithm draws its random numbers is fixed, so a change to it would be
+    added as a new algorithm rather than change the mazes of existing seeds.
     """
     # Minimum size of maze is 6x6
     assert size >= 6
@@ -15,12 +80,43 @@ def generate_maze(size, np_rng=None, seed=None):
     # boundary buffer walls and using cells as walls
     assert size % 2 == 0
 
+    assert algorithm in MAZE_ALGORITHMS, (
+        f"Unknown maze generation algorithm {algorithm}"
+    )
+
     if np_rng is None:
         np_rng = np.random.default_rng(seed=seed)
 
+    if algorithm == "eller":
+        # Stream the rows straight into the output
+        if out is None:
+            row_size = (size + 7) // 8 if packed else size
+            out = np.empty((size, row_size), dtype=np.uint8)
+        for x, row in enumerate(generate_maze_rows(size, np_rng)):
+            out[x] = np.packbits(row) if packed else row
+        return out
+
+    if algorithm == "fast_dfs":
+        maze = _add_entrance_and_exit(_generate_maze_fast_dfs(size, np_rng))
+    else:
+        maze = _generate_maze_dfs(size, np_rng)
+
+    if packed:
+        maze = np.packbits(maze, axis=1)
+    if out is None:
+        return maze
+    out[:] = maze
+    return out
+
+
+def _generate_maze_dfs(size, np_rng):
+    """
+    Randomised DFS shuffling the list of directions at every step, as originally used by
+    `DungeonMazeEnv`.
+    """
     # Create initial grid filled with walls,
     # reserve buffer for entrance/exit
-    maze = np.ones((size - 1, size - 1))
+    maze = np.ones((size - 1, size - 1), dtype=np.uint8)
 
     # Calculate number of aisles that are not walls
     num_aisles = (size - 1) // 2
@@ -31,7 +127,7 @@ def generate_maze(size, np_rng=None, seed=None):
     stack = [(start_x, start_y)]
 
     # Define possible directions
-    directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    directions = list(MAZE_DIRECTIONS)
 
     while len(stack) > 0:
         current_x, current_y = stack[-1]
@@ -57,6 +153,14 @@ def generate_maze(size, np_rng=None, seed=None):
         else:  # no break
             stack.pop()
 
+    return _add_entrance_and_exit(maze)
+
+
+def _add_entrance_and_exit(maze):
+    """
+    Pads a generated (size-1, size-1) maze with the extra buffer walls and opens the
+    entrance and exit.
+    """
     # Add the extra buffer walls for protruding entrance and exit.
     maze = np.pad(maze, ((0, 1), (1, 0)), "constant", constant_values=1)
 
@@ -67,6 +171,196 @@ def generate_maze(size, np_rng=None, seed=None):
     return maze
 
 
+def _generate_maze_fast_dfs(size, np_rng):
+    """
+    Randomised DFS over the aisles with aisle (x, y) stored as the integer x * num_aisles + y.
+    The search pops or pushes a cell on every iteration and visits every aisle, so it
+    always takes 2 * num_aisles**2 - 1 iterations and the direction order for each is
+    drawn up front.
+    """
+    inner_size = size - 1
+    num_aisles = inner_size // 2
+    num_cells = num_aisles * num_aisles
+
+    visited = bytearray(num_cells)
+    visited[0] = 1
+    stack = [0]
+
+    # Cells of the inner grid (flattened) that are knocked through to connect aisles
+    passages = []
+
+    orders = np_rng.integers(0, len(MAZE_DIRECTION_ORDERS), size=2 * num_cells - 1)
+    for order in orders.tolist():
+        current = stack[-1]
+        current_x, current_y = divmod(current, num_aisles)
+        for dx, dy in MAZE_DIRECTION_ORDERS[order]:
+            neighbour_x, neighbour_y = current_x + dx, current_y + dy
+            if 0 <= neighbour_x < num_aisles and 0 <= neighbour_y < num_aisles:
+                neighbour = neighbour_x * num_aisles + neighbour_y
+                if not visited[neighbour]:
+                    visited[neighbour] = 1
+                    passages.append(
+                        (2 * current_x + 1 + dx) * inner_size + 2 * current_y + 1 + dy
+                    )
+                    stack.append(neighbour)
+                    break
+        else:  # no break
+            stack.pop()
+
+    # Every aisle is visited, so all of them are open along with the passages
+    maze = np.ones((inner_size, inner_size), dtype=np.uint8)
+    maze[1::2, 1::2] = 0
+    maze.ravel()[passages] = 0
+    return maze
+
+
+def generate_maze_rows(size, np_rng=None, seed=None):
+    """
+    Generates a maze with Eller's algorithm, yielding the rows maze[0], maze[1], ... of
+    the (size, size) array `generate_maze` would return one at a time, so only one row
+    of the maze is held in memory at once.
+
+    The aisles of each row are labelled with the set of aisles they are connected to
+    through the rows already generated. For every row of aisles the generator draws, in
+    this order, `num_aisles - 1` uniform floats deciding which neighbouring aisles of
+    different sets to join, then `num_aisles` uniform floats deciding which aisles to
+    extend into the next row, every set extending through its aisle with the lowest
+    draw if no draw falls below one half. The last row joins all remaining sets.
+    """
+    assert size >= 6
+    assert size % 2 == 0
+
+    if np_rng is None:
+        np_rng = np.random.default_rng(seed=seed)
+
+    num_aisles = (size - 1) // 2
+    aisle_columns = 2 + 2 * np.arange(num_aisles)
+
+    # The first and last two rows are walls apart from the entrance and exit,
+    # with the maze shifted along one cell as in `_add_entrance_and_exit`
+    yield np.ones(size, dtype=np.uint8)
+
+    # Union-find over the sets of the current row
+    parent = None
+
+    def find(aisle_set):
+        while parent[aisle_set] != aisle_set:
+            parent[aisle_set] = parent[parent[aisle_set]]
+            aisle_set = parent[aisle_set]
+        return aisle_set
+
+    sets = np.arange(num_aisles)
+    for i in range(num_aisles):
+        last_row = i == num_aisles - 1
+
+        # Join neighbouring aisles in different sets, merging the sets
+        joins = np_rng.random(num_aisles - 1) < 0.5
+        if last_row:
+            joins[:] = True
+        parent = list(range(num_aisles))
+        set_list = sets.tolist()
+        joined = []
+        for j in np.flatnonzero(joins & (sets[:-1] != sets[1:])).tolist():
+            left, right = find(set_list[j]), find(set_list[j + 1])
+            if left != right:
+                parent[right] = left
+                joined.append(j)
+
+        row = np.ones(size, dtype=np.uint8)
+        row[aisle_columns] = 0
+        row[aisle_columns[joined] + 1] = 0
+        if i == 0:
+            row[1] = 0
+        yield row
+
+        if last_row:
+            break
+
+        # Extend each set into the next row through at least one of its aisles
+        roots = np.array(parent)
+        while np.any(roots[roots] != roots):
+            roots = roots[roots]
+        sets = roots[sets]
+        draws = np_rng.random(num_aisles)
+        extend = draws < 0.5
+        order = np.lexsort((draws, sets))
+        first_in_set = np.ones(num_aisles, dtype=bool)
+        first_in_set[1:] = sets[order][1:] != sets[order][:-1]
+        set_extends = np.zeros(num_aisles, dtype=bool)
+        np.logical_or.at(set_extends, sets, extend)
+        lowest = order[first_in_set]
+        extend[lowest[~set_extends[sets[lowest]]]] = True
+
+        row = np.ones(size, dtype=np.uint8)
+        row[aisle_columns[extend]] = 0
+        yield row
+
+        # Aisles not extended into start new sets of their own
+        sets = np.where(extend, sets, num_aisles + np.arange(num_aisles))
+        sets = np.unique(sets, return_inverse=True)[1]
+
+    row = np.ones(size, dtype=np.uint8)
+    row[size - 2] = 0
+    yield row
+    yield np.ones(size, dtype=np.uint8)
+
+
+def maze_seed_sequence(seed, index):
+    """
+    Returns the seed sequence of maze `index` in the stream of mazes generated from
+    `seed` by `generate_mazes`, i.e. `np.random.SeedSequence(seed).spawn(n)[index]`.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(index,))
+
+
+def _generate_maze_chunk(size, seed_sequences, algorithm):
+    """
+    Generates the mazes for a list of seed sequences, run in the worker processes of
+    `generate_mazes`.
+    """
+    mazes = np.empty((len(seed_sequences), size, size), dtype=np.uint8)
+    for i, seed_sequence in enumerate(seed_sequences):
+        np_rng = np.random.default_rng(seed_sequence)
+        generate_maze(size, np_rng, algorithm=algorithm, out=mazes[i])
+    return mazes
+
+
+def generate_mazes(n, size, seed=None, algorithm="fast_dfs", processes=None, start=0):
+    """
+    Generates `n` mazes as one (n, size, size) uint8 array laid out as in `generate_maze`.
+
+    Maze i is generated by `generate_maze` with a generator seeded by
+    `maze_seed_sequence(seed, i)`, so any maze can be reproduced on its own and the result
+    is the same whether it is generated serially or in parallel. If `processes` is greater
+    than 1 the mazes are generated over a pool of that many worker processes.
+    `start` skips ahead in the stream, returning mazes start, ..., start + n - 1.
+    """
+    if seed is None:
+        # Fix the entropy so all workers draw from the same stream
+        seed = np.random.SeedSequence().entropy
+    seed_sequences = [maze_seed_sequence(seed, start + i) for i in range(n)]
+
+    if processes is None or processes <= 1:
+        return _generate_maze_chunk(size, seed_sequences, algorithm)
+
+    mazes = np.empty((n, size, size), dtype=np.uint8)
+    chunks = np.array_split(np.arange(n), processes * 4)
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        results = pool.map(
+            _generate_maze_chunk,
+            [size] * len(chunks),
+            [[seed_sequences[i] for i in chunk] for chunk in chunks],
+            [algorithm] * len(chunks),
+        )
+        for chunk, chunk_mazes in zip(chunks, results):
+            mazes[chunk] = chunk_mazes
+    return mazes
+
+
+# Source of `MazeGrid.version` values, unique across every grid in the process
+_maze_versions = itertools.count()
+
+
 class MazeGrid:
     """
     MazeGrid object for representing grid and operations on it.
@@ -85,20 +379,64 @@ class MazeGrid:
     # A flipped version of OBJECT_TO_IDX where the keys and values have been switched
     IDX_TO_OBJECT = dict(zip(OBJECT_TO_IDX.values(), OBJECT_TO_IDX.keys()))
 
-    def __init__(self, size, empty=True, np_rng=None):
+    # Whether the robot can occupy a cell, indexed by object type integer
+    # (matches `can_overlap` of the corresponding maze objects)
+    OBJECT_CAN_OVERLAP = np.array([True, False, True, True, True, True])
+
+    # Maze object class for each object type
+    OBJECT_CLASSES = {
+        "wall": Wall,
+        "target": Target,
+        "orc": Orc,
+        "wingedbat": Wingedbat,
+        "lizard": Lizard,
+    }
+
+    # Object types that are creatures, which carry an image id
+    CREATURE_TYPES = ("orc", "wingedbat", "lizard")
+
+    # Camera views of the object types without an image id, i.e. empty, wall and target
+    STATIC_CAMERA_VIEWS = (EMPTY_VIEW, WALL_VIEW, TARGET_VIEW)
+
+    def __init__(self, size, empty=True, np_rng=None, stats=None, algorithm="dfs"):
         """Set up the maze.
 
         If `empty` is True then just create an empty grid.
         Otherwise generate the maze, add walls and add a target.
 
         If `np_rng` is provided, this will be used as the seed for the rng.
+        `algorithm` is the `generate_maze` algorithm used to generate the maze.
+
+        If an `EnvStats` is given as `stats`, the time spent generating the maze and
+        building the grid is recorded in it.
+
+        The grid is stored as a uint8 array of object type integers (see `OBJECT_TO_IDX`)
+        indexed as [x, y], with a sparse side table holding the image ids of creatures.
+        Maze objects are only created when they are asked for by `get_cell_item`.
         """
         # Maze is always square
         self.width = size
         self.height = size
 
         # Initialise empty grid
-        self.grid = [None] * size * size
+        self.cells = np.zeros((size, size), dtype=np.uint8)
+
+        # Image ids of the creatures in the grid, keyed by (x, y)
+        self.creatures = {}
+
+        # Maze objects that have been added or asked for, keyed by (x, y)
+        self._objects = {}
+
+        # Whether `cells` belongs to this grid alone, rather than being shared with
+        # copies of it (see `copy`)
+        self._owns_cells = True
+
+        # Positions of the creatures of each type, built from `creatures` when needed
+        self._creature_positions = None
+
+        # Identifies the contents of the grid: a new value whenever a cell item is
+        # added, shared with copies until either is changed, so caches can be keyed on it
+        self.version = next(_maze_versions)
 
         # if we have requested an empty maze, then there's nothing more to do and we can exit the
         # method early
@@ -108,55 +446,251 @@ class MazeGrid:
         # Otherwise, generate the maze, add the walls and add the target
 
         # Generate the maze
-        maze = generate_maze(size, np_rng)
-
-        # Add the walls to grid
-        for (x, y), elem in np.ndenumerate(maze):
-            if elem == 1:
-                self.add_cell_item(x, y, Wall(pos=np.array([x, y])))
+        if stats is not None:
+            start = time.perf_counter()
+        # Walls are encoded as 1 in both, so the maze is generated straight into the grid
+        generate_maze(size, np_rng, algorithm=algorithm, out=self.cells)
+        if stats is not None:
+            stats.add_time("maze_generation", time.perf_counter() - start)
+            start = time.perf_counter()
 
         # Add the target at the maze exit (always at [-2, -2])
-        self.add_cell_item(
-            self.width - 2, self.height - 2, Target(pos=np.array([-2, -2]))
-        )
+        self.cells[self.width - 2, self.height - 2] = self.OBJECT_TO_IDX["target"]
+        if stats is not None:
+            stats.add_time("grid_construction", time.perf_counter() - start)
+
+    @staticmethod
+    def from_walls(walls):
+        """
+        Produces the maze from a wall array as returned by `generate_maze`,
+        adding the target at the maze exit.
+        """
+        width, height = walls.shape
+        assert width == height
+
+        maze = MazeGrid(width)
+        maze.cells[walls == 1] = MazeGrid.OBJECT_TO_IDX["wall"]
+        maze.cells[width - 2, height - 2] = MazeGrid.OBJECT_TO_IDX["target"]
+        return maze
 
     def __eq__(self, other):
         """Allows us to compare mazes to one another."""
-        grid1 = self.encode_maze_to_array()
-        grid2 = other.encode_maze_to_array()
-        return np.array_equal(grid2, grid1)
+        return np.array_equal(self.cells, other.cells)
+
+    def copy(self):
+        """
+        Produces a copy of the grid that shares the cell array with this grid until
+        either of them adds a cell item, so copying takes the same time for any size.
+        """
+        maze = MazeGrid.__new__(MazeGrid)
+        maze.width = self.width
+        maze.height = self.height
+        maze.cells = self.cells
+        maze.creatures = self.creatures.copy()
+        maze._objects = self._objects.copy()
+        maze._owns_cells = False
+        maze._creature_positions = self._creature_positions
+        maze.version = self.version
+        self._owns_cells = False
+        return maze
+
+    def _own_cells(self):
+        """
+        Stops sharing the cells with copies of the grid before they are changed.
+        """
+        if not self._owns_cells:
+            self.cells = self.cells.copy()
+            self._owns_cells = True
+
+    @property
+    def grid(self):
+        """
+        List of the maze objects in every cell, indexed by y * width + x.
+        Note this creates an object for every non-empty cell in the grid.
+        """
+        return [
+            self.get_cell_item(x, y)
+            for y in range(self.height)
+            for x in range(self.width)
+        ]
 
     def add_cell_item(self, x, y, maze_object):
         """Add maze object to grid at the specified x y coordinates."""
         assert x >= 0 and x < self.width
         assert y >= 0 and y < self.height
-        self.grid[y * self.width + x] = maze_object
+        self._own_cells()
+        self.version = next(_maze_versions)
+        self._objects.pop((x, y), None)
+        self._creature_positions = None
+        self.creatures.pop((x, y), None)
+
+        if maze_object is None:
+            self.cells[x, y] = self.OBJECT_TO_IDX["empty"]
+            return
+
+        self.cells[x, y] = self.OBJECT_TO_IDX[maze_object.type]
+        self._objects[(x, y)] = maze_object
+        if maze_object.type in self.CREATURE_TYPES:
+            self.creatures[(x, y)] = maze_object.image_id
 
     def get_cell_item(self, x, y):
         """Retrieve an item from the grid at the specified x y coordinates."""
         assert x >= 0 and x < self.width
         assert y >= 0 and y < self.height
-        return self.grid[y * self.width + x]
+        maze_object = self._objects.get((x, y))
+        if maze_object is not None:
+            return maze_object
+
+        maze_object_type_index = self.cells[x, y]
+        if maze_object_type_index == self.OBJECT_TO_IDX["empty"]:
+            return None
+
+        # Create the object on first request
+        maze_object_type = self.IDX_TO_OBJECT[maze_object_type_index]
+        maze_object_class = self.OBJECT_CLASSES[maze_object_type]
+        if maze_object_type in self.CREATURE_TYPES:
+            maze_object = maze_object_class(
+                pos=np.array([x, y]), image_id=self.creatures.get((x, y), 0)
+            )
+        else:
+            maze_object = maze_object_class(pos=np.array([x, y]))
+
+        self._objects[(x, y)] = maze_object
+        return maze_object
+
+    def populate_creatures(self, counts, np_rng=None, seed=None):
+        """
+        Places creatures in empty cells chosen at random, other than the robot's starting
+        cell [1, 1], with random image ids. `counts` maps creature types (see
+        `CREATURE_TYPES`) to the number of them to place.
+
+        The cells and image ids are drawn in one call each from `np_rng` (or a generator
+        seeded with `seed`), so the same seed always gives the same creatures.
+        Returns the (n, 2) array of the positions of the new creatures.
+        """
+        assert all(creature_type in self.CREATURE_TYPES for creature_type in counts)
+        if np_rng is None:
+            np_rng = np.random.default_rng(seed=seed)
+
+        codes = np.repeat(
+            [
+                self.OBJECT_TO_IDX[creature_type]
+                for creature_type in self.CREATURE_TYPES
+            ],
+            [counts.get(creature_type, 0) for creature_type in self.CREATURE_TYPES],
+        ).astype(np.uint8)
+
+        # Flat indices of the empty cells, leaving the robot's starting cell free
+        empty_cells = np.flatnonzero(self.cells == self.OBJECT_TO_IDX["empty"])
+        empty_cells = empty_cells[empty_cells != self.height + 1]
+        assert len(codes) <= len(empty_cells), "Not enough empty cells for creatures"
+
+        chosen = np_rng.choice(empty_cells, size=len(codes), replace=False)
+        image_ids = np_rng.integers(0, NUM_SPRITES, size=len(codes))
+
+        self._own_cells()
+        self.version = next(_maze_versions)
+        xs, ys = np.divmod(chosen, self.height)
+        self.cells[xs, ys] = codes
+        positions = list(zip(xs.tolist(), ys.tolist()))
+        for position in positions:
+            self._objects.pop(position, None)
+        self.creatures.update(zip(positions, image_ids.tolist()))
+        self._creature_positions = None
+        return np.stack([xs, ys], axis=1)
+
+    def get_creature_positions(self, creature_type=None):
+        """
+        Returns the (n, 2) array of the positions of the creatures of the given type,
+        or of all creatures. Positions are looked up in an index by type rather than by
+        scanning the grid.
+        """
+        if self._creature_positions is None:
+            positions = np.array(list(self.creatures), dtype=int).reshape(-1, 2)
+            codes = self.cells[positions[:, 0], positions[:, 1]]
+            self._creature_positions = {
+                creature_type: positions[codes == self.OBJECT_TO_IDX[creature_type]]
+                for creature_type in self.CREATURE_TYPES
+            }
+            self._creature_positions[None] = positions
+        return self._creature_positions[creature_type]
+
+    def nearest_creature(self, position, creature_type=None):
+        """
+        Returns the creature of the given type, or of any type, closest to `position`
+        by Manhattan distance, or None if there are none.
+        """
+        positions = self.get_creature_positions(creature_type)
+        if len(positions) == 0:
+            return None
+        distances = np.abs(positions - np.asarray(position)).sum(axis=1)
+        return self.get_cell_item(*positions[distances.argmin()])
+
+    def get_camera_view(self, x, y):
+        """
+        Returns the camera view of the robot when facing the cell at the specified x y
+        coordinates, without creating a maze object unless the cell holds a creature.
+        """
+        maze_object = self._objects.get((x, y))
+        if maze_object is not None:
+            return maze_object.get_camera_view()
+        maze_object_type_index = self.cells.item(x, y)
+        if maze_object_type_index < 3:
+            return self.STATIC_CAMERA_VIEWS[maze_object_type_index]
+        return self.get_cell_item(x, y).get_camera_view()
+
+    def can_overlap(self, x, y):
+        """
+        Returns whether the robot can move into the cell at the specified x y
+        coordinates, without creating a maze object.
+        """
+        maze_object = self._objects.get((x, y))
+        if maze_object is not None:
+            return maze_object.can_overlap()
+        return self.OBJECT_CAN_OVERLAP.item(self.cells.item(x, y))
+
+    def get_camera_view_table(self):
+        """
+        Returns the distinct camera views of the cells of the grid stacked in one
+        (n, 20, 20) array, and the index into it of the view of every cell as an int32
+        array indexed as [x, y], so the views of many cells can be gathered at once.
+        """
+        view_indices = self.cells.astype(np.int32)
+        views = list(self.STATIC_CAMERA_VIEWS)
+        view_ids = {}
+        xs, ys = np.nonzero(self.cells >= len(self.STATIC_CAMERA_VIEWS))
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            view = self.get_camera_view(x, y)
+            if id(view) not in view_ids:
+                view_ids[id(view)] = len(views)
+                views.append(view)
+            view_indices[x, y] = view_ids[id(view)]
+        return np.stack(views), view_indices
 
     def encode_maze_to_array(self):
         """
         Produces the entire grid as a encoded numpy array.
         """
-        array = np.zeros((self.width, self.height), dtype="uint8")
+        return self.cells.copy()
 
-        for i in range(self.width):
-            for j in range(self.height):
-                maze_object = self.get_cell_item(i, j)
-                if maze_object is None:
-                    array[i, j] = self.OBJECT_TO_IDX["empty"]
-                else:
-                    array[i, j] = self.OBJECT_TO_IDX[maze_object.type]
-        return array
+    def encode_sprites_to_array(self):
+        """
+        Produces the image ids of the creatures in the grid as a uint8 array indexed
+        as [x, y], with 0 in cells without a creature. Together with
+        `encode_maze_to_array` this encodes the grid losslessly.
+        """
+        sprites = np.zeros((self.width, self.height), dtype=np.uint8)
+        if self.creatures:
+            positions = np.array(list(self.creatures))
+            sprites[positions[:, 0], positions[:, 1]] = list(self.creatures.values())
+        return sprites
 
     @staticmethod
-    def decode_maze_from_array(array):
+    def decode_maze_from_array(array, sprite_array=None):
         """
-        Produces the grid for the maze from an encoded array.
+        Produces the grid for the maze from an encoded array, and optionally the image
+        ids of its creatures from an array made by `encode_sprites_to_array`. Creatures
+        have image id 0 if `sprite_array` is not given.
 
         E.g. An encoded array for grid size 6 could look like,
 
@@ -172,30 +706,22 @@ class MazeGrid:
         """
         width, height = array.shape
         assert width == height
+        assert np.all(np.asarray(array) < len(MazeGrid.IDX_TO_OBJECT)), (
+            "Unknown maze object type in decode"
+        )
 
         maze = MazeGrid(width)
-        for i in range(width):
-            for j in range(height):
-                maze_object_type_index = array[i, j]
-                if maze_object_type_index == MazeGrid.OBJECT_TO_IDX["empty"]:
-                    continue
-
-                maze_object_type = MazeGrid.IDX_TO_OBJECT[maze_object_type_index]
-
-                if maze_object_type == "wall":
-                    maze_object = Wall(pos=np.array([i, j]))
-                elif maze_object_type == "target":
-                    maze_object = Target(pos=np.array([i, j]))
-                elif maze_object_type == "orc":
-                    maze_object = Orc(pos=np.array([i, j]))
-                elif maze_object_type == "wingedbat":
-                    maze_object = Wingedbat(pos=np.array([i, j]))
-                elif maze_object_type == "lizard":
-                    maze_object = Lizard(pos=np.array([i, j]))
-                else:
-                    assert False, (
-                        f"Unknown maze object type in decode {maze_object_type}"
-                    )
+        maze.cells[:] = array
 
-                maze.add_cell_item(i, j, maze_object)
+        creature_cells = np.isin(
+            maze.cells,
+            [MazeGrid.OBJECT_TO_IDX[creature] for creature in MazeGrid.CREATURE_TYPES],
+        )
+        if creature_cells.any():
+            xs, ys = np.nonzero(creature_cells)
+            if sprite_array is None:
+                image_ids = [0] * len(xs)
+            else:
+                image_ids = np.asarray(sprite_array)[xs, ys].tolist()
+            maze.creatures = dict(zip(zip(xs.tolist(), ys.tolist()), image_ids))
         return maze
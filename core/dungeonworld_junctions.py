@@ -0,0 +1,143 @@
+"""
+Compression of a maze into a graph of junctions and dead ends joined by corridors.
+"""
+
+import heapq
+
+import numpy as np
+
+from .dungeonworld_grid import DIRECTION_DELTAS, MazeGrid
+
+# Node of cells that are not junctions, dead ends, the entrance or the target,
+# and edge of directions without a corridor
+NO_NODE = -1
+NO_EDGE = -1
+
+
+class JunctionGraph:
+    """
+    Graph of the cells of a maze the robot can stand in that are not corridor cells,
+    i.e. junctions, dead ends, the entrance [1,1] and the target, with an edge for each
+    corridor between two of them.
+
+    A corridor cell has exactly two open neighbours, so a robot entering it can only
+    carry on to the next cell. Most cells of a generated maze are corridor cells, so
+    the graph is several times smaller than the grid.
+
+    `nodes[i]` is the position of node i, and `node_index[x, y]` the node at a cell or
+    `NO_NODE`. Edge j leaves node `edge_source[j]` heading `edge_direction[j]` and
+    reaches node `edge_target[j]` after `edge_length[j]` moves, in the directions
+    `get_edge_path(j)`. `edge_from[i, direction]` is the edge leaving node i in that
+    direction, or `NO_EDGE`. Every corridor has an edge in each direction.
+    """
+
+    def __init__(self, maze, target_position=None):
+        cells = maze.cells if isinstance(maze, MazeGrid) else np.asarray(maze)
+        size = cells.shape[0]
+        if target_position is None:
+            target_position = (size - 2, size - 2)
+
+        # Cells the robot can stand in, and how many of their neighbours it can move to
+        is_open = MazeGrid.OBJECT_CAN_OVERLAP[cells]
+        padded = np.pad(is_open, 1)
+        num_open_neighbours = sum(
+            padded[1 + dx : 1 + dx + size, 1 + dy : 1 + dy + size].astype(int)
+            for dx, dy in DIRECTION_DELTAS
+        )
+        is_node = is_open & (num_open_neighbours != 2)
+        is_node[1, 1] = is_open[1, 1]
+        is_node[tuple(target_position)] = is_open[tuple(target_position)]
+
+        self.size = size
+        self.nodes = np.argwhere(is_node)
+        self.node_index = np.full((size, size), NO_NODE, dtype=np.int64)
+        self.node_index[is_node] = np.arange(len(self.nodes))
+
+        # Follow the corridor leaving each node in each open direction
+        open_cells = padded.tolist()
+        node_cells = np.pad(is_node, 1).tolist()
+        sources, directions, targets, path_offsets, path = [], [], [], [0], []
+        for i, (x, y) in enumerate(self.nodes.tolist()):
+            for direction, (dx, dy) in enumerate(DIRECTION_DELTAS):
+                if not open_cells[1 + x + dx][1 + y + dy]:
+                    continue
+                sources.append(i)
+                directions.append(direction)
+                x_, y_ = x + dx, y + dy
+                path.append(direction)
+                while not node_cells[1 + x_][1 + y_]:
+                    # Carry on through the one open neighbour not behind the robot
+                    for turn in (0, 1, 3):
+                        next_direction = (path[-1] + turn) % 4
+                        dx, dy = DIRECTION_DELTAS[next_direction]
+                        if open_cells[1 + x_ + dx][1 + y_ + dy]:
+                            break
+                    x_, y_ = x_ + dx, y_ + dy
+                    path.append(next_direction)
+                targets.append(self.node_index[x_, y_])
+                path_offsets.append(len(path))
+
+        self.edge_source = np.array(sources, dtype=np.int64)
+        self.edge_direction = np.array(directions, dtype=np.int64)
+        self.edge_target = np.array(targets, dtype=np.int64)
+        self._path_offsets = np.array(path_offsets, dtype=np.int64)
+        self._path = np.array(path, dtype=np.int64)
+        self.edge_length = np.diff(self._path_offsets)
+        self.edge_from = np.full((len(self.nodes), 4), NO_EDGE, dtype=np.int64)
+        self.edge_from[self.edge_source, self.edge_direction] = np.arange(
+            len(self.edge_source)
+        )
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_source)
+
+    def get_node(self, x, y):
+        """The node at the given cell, or `NO_NODE`."""
+        return int(self.node_index[x, y])
+
+    def get_edge_path(self, edge):
+        """The direction of each move along an edge."""
+        return self._path[self._path_offsets[edge] : self._path_offsets[edge + 1]]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the edges of a path with the fewest moves from node `source` to node
+        `target`, found by Dijkstra's algorithm over the graph, or None if there is
+        no path.
+        """
+        distance = np.full(self.num_nodes, np.inf)
+        previous_edge = np.full(self.num_nodes, NO_EDGE, dtype=np.int64)
+        distance[source] = 0
+        edge_from = self.edge_from.tolist()
+        edge_target = self.edge_target.tolist()
+        edge_length = self.edge_length.tolist()
+        queue = [(0, source)]
+        while queue:
+            node_distance, node = heapq.heappop(queue)
+            if node == target:
+                break
+            if node_distance > distance[node]:
+                continue
+            for edge in edge_from[node]:
+                if edge == NO_EDGE:
+                    continue
+                next_node = edge_target[edge]
+                next_distance = node_distance + edge_length[edge]
+                if next_distance < distance[next_node]:
+                    distance[next_node] = next_distance
+                    previous_edge[next_node] = edge
+                    heapq.heappush(queue, (next_distance, next_node))
+
+        if np.isinf(distance[target]):
+            return None
+        edges = []
+        node = target
+        while node != source:
+            edges.append(int(previous_edge[node]))
+            node = int(self.edge_source[edges[-1]])
+        return edges[::-1]
@@ -0,0 +1,236 @@
+"""
+Exact tabular MDP of the default `DungeonMazeEnv` dynamics and solvers for it.
+
+States are the robot's (x, y, direction) in one or more mazes, numbered as
+((maze * size + x) * size + y) * 4 + direction. Actions are numbered as in `Actions`.
+"""
+
+import numpy as np
+
+from .dungeonworld_grid import DIRECTION_VECTORS, MazeGrid
+
+# Actions numbered as in `Actions`
+TURN_RIGHT = 0
+TURN_LEFT = 1
+MOVE_FORWARDS = 2
+NUM_ACTIONS = 3
+
+# Number of directions the robot can face
+NUM_DIRECTIONS = 4
+
+# Discount below which the remaining return of a policy is ignored
+DISCOUNT_TOLERANCE = 1e-17
+
+
+class MazeMDP:
+    """
+    Deterministic MDP of one or more mazes of the same size.
+
+    `next_state[s, a]` and `reward[s, a]` give the state reached and reward received when
+    taking action `a` in state `s`. States where the robot is at the target, or inside a
+    cell it cannot occupy, are absorbing with zero reward and flagged by `terminal` and
+    `~valid` respectively.
+    """
+
+    def __init__(self, size, num_mazes, next_state, reward, terminal, valid):
+        self.size = size
+        self.num_mazes = num_mazes
+        self.next_state = next_state
+        self.reward = reward
+        self.terminal = terminal
+        self.valid = valid
+
+    @property
+    def num_states(self):
+        return len(self.next_state)
+
+    def state_index(self, x, y, direction, maze=0):
+        """
+        Returns the index of the state with the robot at (x, y) facing `direction`.
+        """
+        return ((maze * self.size + x) * self.size + y) * NUM_DIRECTIONS + direction
+
+    def to_grid(self, array):
+        """
+        Reshapes a per-state array to (num_mazes, size, size, 4) indexed as [maze, x, y, direction].
+        """
+        return np.reshape(array, (self.num_mazes, self.size, self.size, NUM_DIRECTIONS))
+
+
+def _as_cells(mazes):
+    """
+    Stacks a MazeGrid, an encoded maze array, or a list or array of either,
+    into an (n, size, size) array of encoded mazes.
+    """
+    if isinstance(mazes, MazeGrid):
+        return mazes.cells[np.newaxis]
+    if isinstance(mazes, np.ndarray):
+        return mazes if mazes.ndim == 3 else mazes[np.newaxis]
+    return np.stack(
+        [maze.cells if isinstance(maze, MazeGrid) else maze for maze in mazes]
+    )
+
+
+def compile_maze_mdp(mazes, target_position=None, bump_reward=0):
+    """
+    Compiles one or more mazes into a `MazeMDP` following the rules of `DungeonMazeEnv.step`.
+
+    `mazes` may be a MazeGrid, an encoded maze array, or a list or array of either.
+    The target defaults to [size-2, size-2] as in `DungeonMazeEnv`.
+
+    Every action costs -1, except moving forwards into a cell the robot cannot occupy,
+    which leaves the robot in place and gives `bump_reward`. With the default of 0, as in
+    the environment, bumping into a wall forever never costs anything, so to value
+    reaching the target use a negative `bump_reward`.
+    """
+    cells = _as_cells(mazes)
+    num_mazes, size, _ = cells.shape
+    if target_position is None:
+        target_position = (size - 2, size - 2)
+
+    maze_idx, x, y, direction = np.meshgrid(
+        np.arange(num_mazes),
+        np.arange(size),
+        np.arange(size),
+        np.arange(NUM_DIRECTIONS),
+        indexing="ij",
+    )
+    cell_index = (maze_idx * size + x) * size + y
+    states = cell_index * NUM_DIRECTIONS + direction
+
+    next_state = np.empty(states.shape + (NUM_ACTIONS,), dtype=np.int64)
+    reward = np.full(states.shape + (NUM_ACTIONS,), -1.0)
+
+    # Turning only changes the direction
+    next_state[..., TURN_RIGHT] = cell_index * NUM_DIRECTIONS + (direction + 1) % 4
+    next_state[..., TURN_LEFT] = cell_index * NUM_DIRECTIONS + (direction - 1) % 4
+
+    # Moving forwards succeeds if the robot can occupy the cell in front
+    front_x = x + DIRECTION_VECTORS[direction, 0]
+    front_y = y + DIRECTION_VECTORS[direction, 1]
+    in_bounds = (front_x >= 0) & (front_x < size) & (front_y >= 0) & (front_y < size)
+    front_x = np.clip(front_x, 0, size - 1)
+    front_y = np.clip(front_y, 0, size - 1)
+    can_move = (
+        in_bounds & MazeGrid.OBJECT_CAN_OVERLAP[cells[maze_idx, front_x, front_y]]
+    )
+    front_states = (
+        (maze_idx * size + front_x) * size + front_y
+    ) * NUM_DIRECTIONS + direction
+    next_state[..., MOVE_FORWARDS] = np.where(can_move, front_states, states)
+    reward[..., MOVE_FORWARDS] = np.where(can_move, -1.0, bump_reward)
+
+    # The episode ends at the target, and the robot can never be inside a blocked cell
+    terminal = (x == target_position[0]) & (y == target_position[1])
+    valid = MazeGrid.OBJECT_CAN_OVERLAP[cells[maze_idx, x, y]]
+    absorbing = terminal | ~valid
+    next_state[absorbing] = states[absorbing, np.newaxis]
+    reward[absorbing] = 0
+
+    num_states = states.size
+    return MazeMDP(
+        size,
+        num_mazes,
+        next_state.reshape(num_states, NUM_ACTIONS),
+        reward.reshape(num_states, NUM_ACTIONS),
+        terminal.ravel(),
+        valid.ravel(),
+    )
+
+
+def value_iteration(mdp, gamma=1.0, tolerance=1e-9, max_iterations=None):
+    """
+    Solves the MDP by value iteration, returning the optimal values and a greedy policy.
+
+    Iteration stops once no value changes by more than `tolerance`. With `gamma` of 1 the
+    number of iterations is capped at the number of states by default, which is enough for
+    every state that can reach the target; values of states that cannot are meaningless.
+    """
+    if max_iterations is None and gamma == 1:
+        max_iterations = mdp.num_states
+
+    values = np.zeros(mdp.num_states)
+    iteration = 0
+    while True:
+        q_values = mdp.reward + gamma * values[mdp.next_state]
+        new_values = q_values.max(axis=1)
+        delta = np.max(np.abs(new_values - values))
+        values = new_values
+        iteration += 1
+        if delta <= tolerance or (
+            max_iterations is not None and iteration >= max_iterations
+        ):
+            break
+
+    return values, q_values.argmax(axis=1)
+
+
+def evaluate_policy(mdp, policy, gamma=1.0):
+    """
+    Returns the exact value of every state under a deterministic policy.
+
+    Uses pointer doubling: after k rounds `values` holds the return of the first 2**k steps
+    from each state and `successor` the state reached after them. With `gamma` of 1, states
+    whose policy loops forever with a nonzero reward get an infinite value.
+    """
+    num_states = len(policy)
+    states = np.arange(num_states)
+    successor = mdp.next_state[states, policy]
+    values = mdp.reward[states, policy].astype(np.float64)
+    discount = float(gamma)
+    num_steps = 1
+    while num_steps < num_states or (gamma < 1 and discount > DISCOUNT_TOLERANCE):
+        values = values + discount * values[successor]
+        successor = successor[successor]
+        discount *= discount
+        num_steps *= 2
+
+    if gamma == 1:
+        # Every state has reached the cycle it ends up in, so a nonzero return over the
+        # next 2**k steps means the cycle keeps adding reward forever
+        remaining = values[successor]
+        values[remaining < 0] = -np.inf
+        values[remaining > 0] = np.inf
+
+    return values
+
+
+def policy_iteration(mdp, gamma=1.0, policy=None):
+    """
+    Solves the MDP by policy iteration, returning the optimal values and policy.
+    Policies are evaluated exactly with `evaluate_policy`.
+    """
+    states = np.arange(mdp.num_states)
+    if policy is None:
+        policy = np.full(mdp.num_states, MOVE_FORWARDS)
+
+    while True:
+        values = evaluate_policy(mdp, policy, gamma)
+        q_values = mdp.reward + gamma * values[mdp.next_state]
+        best_q_values = q_values.max(axis=1)
+
+        # Only switch actions that strictly improve, so ties cannot cycle
+        improved = q_values[states, policy] < best_q_values
+        if not np.any(improved):
+            return values, policy
+        policy = np.where(improved, q_values.argmax(axis=1), policy)
+
+
+def solve_mazes(
+    mazes, gamma=1.0, bump_reward=0, method="value_iteration", target_position=None
+):
+    """
+    Compiles and solves many mazes of the same size together as one MDP.
+
+    Returns the optimal values and policies as (num_mazes, size, size, 4) arrays
+    indexed as [maze, x, y, direction].
+    """
+    assert method in ("value_iteration", "policy_iteration"), f"Unknown method {method}"
+    mdp = compile_maze_mdp(
+        mazes, target_position=target_position, bump_reward=bump_reward
+    )
+    if method == "value_iteration":
+        values, policy = value_iteration(mdp, gamma)
+    else:
+        values, policy = policy_iteration(mdp, gamma)
+    return mdp.to_grid(values), mdp.to_grid(policy)
@@ -1,6 +1,40 @@
-from PIL import Image
 import numpy as np
 
+from .dungeonworld_sprites import get_sprite
+
+
+def _shared_view(value):
+    """
+    Creates a read-only 20x20 greyscale image filled with the given value.
+    """
+    view = np.full((20, 20), value, dtype=np.uint8)
+    view.flags.writeable = False
+    return view
+
+
+# Camera views shared by every cell of the same kind. They are read-only,
+# so copy them before modifying.
+EMPTY_VIEW = _shared_view(255)
+WALL_VIEW = _shared_view(0)
+TARGET_VIEW = _shared_view(146)
+
+# Camera view of cells hidden behind an object, see `core/dungeonworld_sight.py`
+OCCLUDED_VIEW = _shared_view(0)
+
+
+def get_camera_view(object_type, image_id=0):
+    """
+    Returns the shared camera view of a cell holding an object of the given type
+    (one of `MazeGrid.OBJECT_TO_IDX`) and, for creatures, image id.
+    """
+    if object_type == "empty":
+        return EMPTY_VIEW
+    if object_type == "wall":
+        return WALL_VIEW
+    if object_type == "target":
+        return TARGET_VIEW
+    return get_sprite(object_type, image_id)
+
 
 class MazeObject:
     """
@@ -47,7 +81,7 @@ class Target(MazeObject):
     def __init__(self, pos):
         super().__init__("target", pos)
         # Target appears as greyscale green image - update to door image?
-        self.image = 146 * np.ones((20, 20))
+        self.image = TARGET_VIEW
 
     def can_overlap(self):
         return True
@@ -61,7 +95,7 @@ class Wall(MazeObject):
     def __init__(self, pos):
         super().__init__("wall", pos)
         # Walls appear as black image.
-        self.image = np.zeros((20, 20))
+        self.image = WALL_VIEW
 
 
 class Orc(MazeObject):
@@ -74,9 +108,8 @@ class Orc(MazeObject):
     def __init__(self, pos, image_id):
         super().__init__("orc", pos)
         assert image_id >= 0 and image_id <= 99
-        im = Image.open("images/orc/orc_{}.png".format(str(image_id).zfill(3)))
-        self.image = np.array(im)
-        im.close()
+        self.image_id = image_id
+        self.image = get_sprite("orc", image_id)
 
     def can_overlap(self):
         return True
@@ -95,11 +128,8 @@ class Wingedbat(MazeObject):
     def __init__(self, pos, image_id):
         super().__init__("wingedbat", pos)
         assert image_id >= 0 and image_id <= 99
-        im = Image.open(
-            "images/wingedbat/wingedbat_{}.png".format(str(image_id).zfill(3))
-        )
-        self.image = np.array(im)
-        im.close()
+        self.image_id = image_id
+        self.image = get_sprite("wingedbat", image_id)
 
     def can_overlap(self):
         return True
@@ -118,9 +148,8 @@ class Lizard(MazeObject):
     def __init__(self, pos, image_id):
         super().__init__("lizard", pos)
         assert image_id >= 0 and image_id <= 99
-        im = Image.open("images/lizard/lizard_{}.png".format(str(image_id).zfill(3)))
-        self.image = np.array(im)
-        im.close()
+        self.image_id = image_id
+        self.image = get_sprite("lizard", image_id)
 
     def can_overlap(self):
         return True
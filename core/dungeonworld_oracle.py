@@ -0,0 +1,137 @@
+"""
+Shortest path distances to the target and optimal actions for every robot state.
+"""
+
+import collections
+
+import numpy as np
+
+from .dungeonworld_mdp import NUM_ACTIONS, NUM_DIRECTIONS, compile_maze_mdp
+from .dungeonworld_serialization import maze_hash
+
+# Distance and action of states that cannot reach the target
+UNREACHABLE = -1
+NO_ACTION = -1
+
+
+def _reverse_bfs(mdp):
+    """
+    Breadth first search backwards from the terminal states of the MDP, returning the
+    number of steps from every state to the target.
+    """
+    num_states = mdp.num_states
+
+    # Predecessors of every state in compressed sparse row form,
+    # ignoring actions that leave the state unchanged
+    sources = np.repeat(np.arange(num_states), NUM_ACTIONS)
+    destinations = mdp.next_state.ravel()
+    moves = sources != destinations
+    sources, destinations = sources[moves], destinations[moves]
+    order = np.argsort(destinations, kind="stable")
+    predecessors = sources[order]
+    offsets = np.zeros(num_states + 1, dtype=np.int64)
+    np.cumsum(np.bincount(destinations, minlength=num_states), out=offsets[1:])
+
+    distance = np.full(num_states, UNREACHABLE, dtype=np.int64)
+    frontier = np.flatnonzero(mdp.terminal & mdp.valid)
+    distance[frontier] = 0
+    level = 0
+    while len(frontier) > 0:
+        level += 1
+        # Gather the predecessors of every state in the frontier
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = predecessors[np.repeat(starts, counts) + steps]
+
+        frontier = np.unique(candidates[distance[candidates] == UNREACHABLE])
+        distance[frontier] = level
+
+    return distance
+
+
+class MazeOracle:
+    """
+    Distance to the target and an optimal action for every (x, y, direction) of a maze,
+    found by a reverse breadth first search from the target.
+
+    `distance[x, y, direction]` is the fewest actions needed to reach the target, or
+    `UNREACHABLE`. `optimal_action[x, y, direction]` is an action on a shortest path, or
+    `NO_ACTION` at the target and in states that cannot reach it.
+    """
+
+    def __init__(self, maze, target_position=None):
+        mdp = compile_maze_mdp(maze, target_position=target_position)
+        distance = _reverse_bfs(mdp)
+
+        # An action is optimal if it leads one step closer to the target
+        next_distance = distance[mdp.next_state]
+        closer = (next_distance == distance[:, np.newaxis] - 1) & (
+            distance[:, np.newaxis] > 0
+        )
+        optimal_action = np.where(closer.any(axis=1), closer.argmax(axis=1), NO_ACTION)
+
+        shape = (mdp.size, mdp.size, NUM_DIRECTIONS)
+        self.distance = distance.reshape(shape)
+        self.optimal_action = optimal_action.reshape(shape)
+
+    def get_distance(self, x, y, direction):
+        """Number of actions needed to reach the target from the given state."""
+        return int(self.distance[x, y, direction])
+
+    def get_optimal_action(self, x, y, direction):
+        """An action on a shortest path to the target from the given state."""
+        return int(self.optimal_action[x, y, direction])
+
+
+def _maze_key(maze, target_position):
+    """
+    Key identifying the contents of a maze and its target.
+    """
+    return maze_hash(maze).tobytes(), target_position
+
+
+class MazeOracleCache:
+    """
+    Least recently used cache of `MazeOracle`s keyed by maze contents, so mazes seen again
+    (e.g. the same seed or corpus index) are not searched again.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._oracles = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._oracles)
+
+    def get(self, maze, target_position=None):
+        """
+        Returns the oracle for the maze, searching it if it is not in the cache.
+        """
+        # The same default target as `compile_maze_mdp`, so both spellings share a key
+        if target_position is None:
+            size = maze.width
+            target_position = (size - 2, size - 2)
+        target_position = tuple(int(i) for i in target_position)
+        key = _maze_key(maze, target_position)
+        oracle = self._oracles.get(key)
+        if oracle is not None:
+            self._oracles.move_to_end(key)
+            return oracle
+
+        oracle = MazeOracle(maze, target_position=target_position)
+        self._oracles[key] = oracle
+        if len(self._oracles) > self.maxsize:
+            self._oracles.popitem(last=False)
+        return oracle
+
+
+# Process wide cache shared by every environment
+_default_cache = MazeOracleCache()
+
+
+def get_maze_oracle(maze, target_position=None):
+    """
+    Returns the oracle for the maze from the process wide cache.
+    """
+    return _default_cache.get(maze, target_position)
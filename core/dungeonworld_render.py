@@ -0,0 +1,206 @@
+"""
+Pure NumPy rasterizer for drawing mazes as RGB images without pygame.
+
+Frames are (window_size, window_size, 3) uint8 arrays indexed as [row, column], i.e. [y, x],
+laid out like the frames `DungeonMazeEnv` renders with pygame.
+"""
+
+import numpy as np
+
+from .dungeonworld_grid import MazeGrid
+
+BACKGROUND_COLOUR = (255, 255, 255)
+TARGET_COLOUR = (255, 0, 0)
+WALL_COLOUR = (0, 0, 0)
+ROBOT_COLOUR = (0, 0, 255)
+GRIDLINE_COLOUR = (0, 0, 0)
+GRIDLINE_WIDTH = 3
+
+# Corners of the triangle drawn for the robot facing each direction (see `Directions`),
+# as fractions of a grid square
+ROBOT_TRIANGLES = np.array(
+    [
+        # North
+        ((0.1, 0.9), (0.9, 0.9), (0.5, 0.1)),
+        # East
+        ((0.1, 0.9), (0.1, 0.1), (0.9, 0.5)),
+        # South
+        ((0.9, 0.1), (0.1, 0.1), (0.5, 0.9)),
+        # West
+        ((0.9, 0.1), (0.9, 0.9), (0.1, 0.5)),
+    ]
+)
+
+
+def _pixel_cells(num_cells, pix_square_size, num_pixels):
+    """
+    Returns, for every pixel along one axis, the cell covering it and whether any cell
+    does. Cell i covers the pixels from int(i * pix_square_size) for int(pix_square_size)
+    pixels, as pygame draws it.
+    """
+    starts = (np.arange(num_cells) * pix_square_size).astype(int)
+    pixels = np.arange(num_pixels)
+    pixel_cells = np.clip(np.searchsorted(starts, pixels, side="right") - 1, 0, None)
+    covered = pixels < starts[pixel_cells] + int(pix_square_size)
+    return pixel_cells, covered
+
+
+def render_static_layer(cells, target_position, window_size, gridlines=True):
+    """
+    Draws the parts of a maze that do not change during an episode, i.e. the target,
+    the walls and the gridlines, for an encoded maze indexed as [x, y].
+    """
+    grid_width, grid_height = cells.shape
+    pix_square_size = window_size / grid_width
+
+    frame = np.empty((window_size, window_size, 3), dtype=np.uint8)
+    frame[:] = BACKGROUND_COLOUR
+
+    row_cells, row_covered = _pixel_cells(grid_height, pix_square_size, window_size)
+    column_cells, column_covered = _pixel_cells(
+        grid_width, pix_square_size, window_size
+    )
+    covered = row_covered[:, np.newaxis] & column_covered[np.newaxis, :]
+
+    # Look up the contents of the cell under every pixel
+    pixel_objects = cells.T[row_cells[:, np.newaxis], column_cells[np.newaxis, :]]
+
+    target_x, target_y = target_position
+    is_target = (row_cells[:, np.newaxis] == target_y) & (
+        column_cells[np.newaxis, :] == target_x
+    )
+    frame[covered & is_target] = TARGET_COLOUR
+    frame[covered & (pixel_objects == MazeGrid.OBJECT_TO_IDX["wall"])] = WALL_COLOUR
+
+    if gridlines:
+        draw_gridlines(frame, grid_width, pix_square_size)
+
+    return frame
+
+
+def draw_gridlines(frame, num_cells, pix_square_size, offset=(0, 0)):
+    """
+    Draws the lines between grid squares onto a frame in place. `offset` is the pixel
+    position of the top left grid line.
+    """
+    half_width = GRIDLINE_WIDTH // 2
+    for axis, start in zip((1, 0), offset):
+        positions = start + (np.arange(num_cells + 1) * pix_square_size).astype(int)
+        lines = (
+            positions[:, np.newaxis] + np.arange(-half_width, half_width + 1)
+        ).ravel()
+        lines = lines[(lines >= 0) & (lines < frame.shape[axis])]
+        if axis == 0:
+            frame[lines, :] = GRIDLINE_COLOUR
+        else:
+            frame[:, lines] = GRIDLINE_COLOUR
+
+
+def draw_cell_gridlines(frame, position, pix_square_size, offset=(0, 0)):
+    """
+    Redraws the gridlines around the grid square at `position` onto a frame in place,
+    e.g. after drawing the robot over them.
+    """
+    half_width = GRIDLINE_WIDTH // 2
+    left, top = (np.asarray(position) * pix_square_size).astype(int) + offset
+    right, bottom = ((np.asarray(position) + 1) * pix_square_size).astype(int) + offset
+    rows = slice(max(top - half_width, 0), max(bottom + half_width + 1, 0))
+    columns = slice(max(left - half_width, 0), max(right + half_width + 1, 0))
+    for y in (top, bottom):
+        frame[max(y - half_width, 0) : max(y + half_width + 1, 0), columns] = (
+            GRIDLINE_COLOUR
+        )
+    for x in (left, right):
+        frame[rows, max(x - half_width, 0) : max(x + half_width + 1, 0)] = (
+            GRIDLINE_COLOUR
+        )
+
+
+def draw_robot(frame, robot_position, robot_direction, pix_square_size, offset=(0, 0)):
+    """
+    Draws the robot as a triangle pointing in the direction it is facing onto a frame
+    in place. Pixels are filled if their centre lies inside the triangle, and only the
+    pixels of the robot's grid square are visited. `offset` is the pixel position of the
+    top left corner of the grid.
+    """
+    corners = (np.asarray(robot_position) + ROBOT_TRIANGLES[robot_direction]) * (
+        pix_square_size
+    ) + offset
+
+    # Bounding box of the triangle, clipped to the frame
+    left, top = np.maximum(np.floor(corners.min(axis=0)).astype(int), 0)
+    right, bottom = np.minimum(
+        np.ceil(corners.max(axis=0)).astype(int) + 1, frame.shape[1::-1]
+    )
+    if left >= right or top >= bottom:
+        return
+
+    columns = np.arange(left, right)[np.newaxis, :] + 0.5
+    rows = np.arange(top, bottom)[:, np.newaxis] + 0.5
+
+    # A pixel centre is inside if it is on the same side of all three edges
+    edge_sides = []
+    for i in range(3):
+        (x0, y0), (x1, y1) = corners[i], corners[(i + 1) % 3]
+        edge_sides.append((x1 - x0) * (rows - y0) - (y1 - y0) * (columns - x0))
+    inside = ((edge_sides[0] >= 0) & (edge_sides[1] >= 0) & (edge_sides[2] >= 0)) | (
+        (edge_sides[0] <= 0) & (edge_sides[1] <= 0) & (edge_sides[2] <= 0)
+    )
+    frame[top:bottom, left:right][inside] = ROBOT_COLOUR
+
+
+def viewport_origin(robot_position, viewport_size, grid_size):
+    """
+    Returns the cell at the top left corner of a `viewport_size` square of cells centred
+    on the robot, moved as little as needed to keep it inside the grid.
+    """
+    origin = np.asarray(robot_position) - viewport_size // 2
+    return np.clip(origin, 0, max(grid_size - viewport_size, 0))
+
+
+def _minimap_blocks(grid_size, minimap_size):
+    """
+    Returns the number of cells across each block of a minimap, the number of blocks
+    across it and the number of pixels across each block.
+    """
+    block_size = -(-grid_size // minimap_size)
+    num_blocks = -(-grid_size // block_size)
+    return block_size, num_blocks, max(minimap_size // num_blocks, 1)
+
+
+def render_minimap(cells, minimap_size):
+    """
+    Draws an overview of a maze at most `minimap_size` pixels across, for an encoded
+    maze indexed as [x, y]. Each pixel covers a square block of cells and is shaded by
+    the fraction of them that are walls. Mazes smaller than `minimap_size` are scaled up.
+    """
+    grid_size = cells.shape[0]
+    block_size, num_blocks, scale = _minimap_blocks(grid_size, minimap_size)
+
+    # Pad the walls to a whole number of blocks, counting the padding as walls
+    walls = np.ones((num_blocks * block_size,) * 2, dtype=np.float32)
+    walls[:grid_size, :grid_size] = cells == MazeGrid.OBJECT_TO_IDX["wall"]
+    wall_fraction = walls.reshape(num_blocks, block_size, num_blocks, block_size).mean(
+        axis=(1, 3)
+    )
+
+    shade = np.round(255 * (1 - wall_fraction)).astype(np.uint8).T
+    shade = np.repeat(np.repeat(shade, scale, axis=0), scale, axis=1)
+    return np.repeat(shade[:, :, np.newaxis], 3, axis=2)
+
+
+def draw_minimap(frame, minimap, grid_size, robot_position, offset=(0, 0)):
+    """
+    Copies a minimap from `render_minimap` onto a frame in place with its top left
+    corner at the pixel position `offset`, marking the robot's block in the robot colour.
+    """
+    left, top = offset
+    height, width = minimap.shape[:2]
+    frame[top : top + height, left : left + width] = minimap
+
+    block_size, _, scale = _minimap_blocks(grid_size, width)
+    robot_left, robot_top = np.asarray(robot_position) // block_size * scale
+    frame[
+        top + robot_top : top + robot_top + scale,
+        left + robot_left : left + robot_left + scale,
+    ] = ROBOT_COLOUR
@@ -0,0 +1,201 @@
+"""
+Compact binary encoding of mazes and content hashes for caching and deduplication.
+
+Each encoded maze is
+
+    header         16 bytes
+        magic      4 bytes, b"DMZS"
+        version    uint8
+        padding    3 bytes
+        size       uint32, grid size
+        num_runs   uint32, number of runs in the object layer
+    walls          (size * size + 7) // 8 bytes, the cells that are walls in C order,
+                   packed eight per byte with `np.packbits`
+    run values     num_runs uint16, object type * 256 + image id of each run
+    run lengths    num_runs uint32, number of cells in each run
+
+all little-endian. The object layer holds every cell other than walls and empty cells,
+i.e. the target and creatures, with their image ids (see `encode_sprites_to_array`),
+as runs of equal values over the cells in C order. Walls and empty cells are 0 in it.
+
+The encoding of a maze depends only on its contents, so its hash (see `maze_hashes`)
+identifies the maze: equal mazes always have equal hashes, across runs and machines.
+"""
+
+import hashlib
+import struct
+
+import numpy as np
+
+from .dungeonworld_grid import MazeGrid
+
+MAGIC = b"DMZS"
+VERSION = 1
+HEADER_FORMAT = "<4sBxxxII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Number of bytes in a maze hash
+HASH_SIZE = 16
+
+
+def _as_batch(mazes, sprites):
+    """
+    Returns the cells and image ids of a `MazeGrid` or an (n, size, size) array of
+    encoded mazes as (n, size, size) uint8 arrays.
+    """
+    if isinstance(mazes, MazeGrid):
+        return mazes.cells[np.newaxis], mazes.encode_sprites_to_array()[np.newaxis]
+    cells = np.asarray(mazes, dtype=np.uint8)
+    if cells.ndim == 2:
+        cells = cells[np.newaxis]
+    if sprites is None:
+        sprites = np.zeros_like(cells)
+    return cells, np.asarray(sprites, dtype=np.uint8).reshape(cells.shape)
+
+
+def serialize_mazes(mazes, sprites=None):
+    """
+    Encodes a `MazeGrid`, or an (n, size, size) array of encoded mazes with an optional
+    array of image ids of the same shape, returning a list of the bytes of each maze.
+    """
+    cells, sprites = _as_batch(mazes, sprites)
+    count, size, _ = cells.shape
+    cells = cells.reshape(count, size * size)
+
+    walls = np.packbits(cells == MazeGrid.OBJECT_TO_IDX["wall"], axis=1)
+
+    # Object layer of every cell, then the runs of equal values in each maze
+    has_object = cells >= MazeGrid.OBJECT_TO_IDX["target"]
+    objects = np.where(
+        has_object,
+        cells.astype(np.uint16) * 256 + sprites.reshape(count, size * size),
+        0,
+    ).astype("<u2")
+    run_starts = np.ones(objects.shape, dtype=bool)
+    run_starts[:, 1:] = objects[:, 1:] != objects[:, :-1]
+    run_mazes, run_cells = np.nonzero(run_starts)
+    run_values = objects[run_mazes, run_cells]
+    num_runs = np.bincount(run_mazes, minlength=count)
+    run_ends = np.append(run_cells[1:], 0)
+    last_runs = np.cumsum(num_runs) - 1
+    run_ends[last_runs] = size * size
+    run_lengths = (run_ends - run_cells).astype("<u4")
+
+    run_offsets = np.concatenate([[0], np.cumsum(num_runs)]).tolist()
+    walls_bytes = walls.tobytes()
+    walls_nbytes = walls.shape[1]
+    values_bytes = run_values.tobytes()
+    lengths_bytes = run_lengths.tobytes()
+    encoded = []
+    for i, runs in enumerate(num_runs.tolist()):
+        start, end = run_offsets[i], run_offsets[i + 1]
+        encoded.append(
+            b"".join(
+                (
+                    struct.pack(HEADER_FORMAT, MAGIC, VERSION, size, runs),
+                    walls_bytes[i * walls_nbytes : (i + 1) * walls_nbytes],
+                    values_bytes[2 * start : 2 * end],
+                    lengths_bytes[4 * start : 4 * end],
+                )
+            )
+        )
+    return encoded
+
+
+def serialize_maze(maze):
+    """
+    Encodes a `MazeGrid` as bytes.
+    """
+    return serialize_mazes(maze)[0]
+
+
+def deserialize_mazes(encoded):
+    """
+    Decodes a sequence of encoded mazes of the same grid size, returning the encoded
+    mazes and the image ids of their creatures as (n, size, size) uint8 arrays.
+    """
+    headers = [struct.unpack_from(HEADER_FORMAT, data) for data in encoded]
+    assert all(magic == MAGIC for magic, _, _, _ in headers), "Not an encoded maze"
+    assert all(version == VERSION for _, version, _, _ in headers)
+    sizes = {size for _, _, size, _ in headers}
+    assert len(sizes) <= 1, "Encoded mazes have different grid sizes"
+    size = sizes.pop() if sizes else 0
+    count = len(encoded)
+    walls_nbytes = (size * size + 7) // 8
+
+    walls = np.frombuffer(
+        b"".join(data[HEADER_SIZE : HEADER_SIZE + walls_nbytes] for data in encoded),
+        dtype=np.uint8,
+    ).reshape(count, walls_nbytes)
+    cells = np.unpackbits(walls, axis=1, count=size * size)
+
+    num_runs = [runs for _, _, _, runs in headers]
+    run_values = np.frombuffer(
+        b"".join(
+            data[HEADER_SIZE + walls_nbytes : HEADER_SIZE + walls_nbytes + 2 * runs]
+            for data, runs in zip(encoded, num_runs)
+        ),
+        dtype="<u2",
+    )
+    run_lengths = np.frombuffer(
+        b"".join(
+            data[HEADER_SIZE + walls_nbytes + 2 * runs :]
+            for data, runs in zip(encoded, num_runs)
+        ),
+        dtype="<u4",
+    )
+    objects = np.repeat(run_values, run_lengths).reshape(count, size * size)
+
+    cells[objects != 0] = (objects[objects != 0] >> 8).astype(np.uint8)
+    sprites = (objects & 255).astype(np.uint8)
+    sprites[cells < MazeGrid.OBJECT_TO_IDX["orc"]] = 0
+    shape = (count, size, size)
+    return cells.reshape(shape), sprites.reshape(shape)
+
+
+def deserialize_maze(data):
+    """
+    Decodes the bytes of an encoded maze as a `MazeGrid`.
+    """
+    cells, sprites = deserialize_mazes([data])
+    return MazeGrid.decode_maze_from_array(cells[0], sprites[0])
+
+
+def maze_hashes(mazes, sprites=None):
+    """
+    Returns the content hashes of a `MazeGrid` or an (n, size, size) array of encoded
+    mazes (with optional image ids) as an (n,) array of 16 byte void values, the BLAKE2b
+    digests of their encodings. A void rather than a byte string type keeps digests
+    ending in zero bytes intact.
+    """
+    return np.frombuffer(
+        b"".join(
+            hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+            for data in serialize_mazes(mazes, sprites)
+        ),
+        dtype=f"V{HASH_SIZE}",
+    )
+
+
+def maze_hash(maze):
+    """
+    Returns the content hash of a `MazeGrid` as a 16 byte void value, equal to its
+    entry in `maze_hashes`. Use its `tobytes()` as a dictionary key.
+    """
+    return maze_hashes(maze)[0]
+
+
+def unique_maze_indices(hashes):
+    """
+    Returns the sorted indices of the first occurrence of every distinct maze, given
+    their hashes, e.g. to deduplicate a generated corpus.
+    """
+    return np.sort(np.unique(hashes, return_index=True)[1])
+
+
+def maze_overlap(hashes, other_hashes):
+    """
+    Returns whether each maze, given by its hash, also appears among `other_hashes`,
+    e.g. to check a test set for mazes in the training set.
+    """
+    return np.isin(hashes, other_hashes)
@@ -0,0 +1,103 @@
+"""
+Line of sight tables for a camera that sees several cells along the robot's direction.
+"""
+
+import numpy as np
+
+from .dungeonworld_grid import DIRECTION_VECTORS, MazeGrid
+from .dungeonworld_objects import OCCLUDED_VIEW
+
+# Cell type of cells hidden behind an object
+OCCLUDED = 255
+
+
+def _scan_sight(blocking):
+    """
+    Returns how many cells are visible from every cell looking along increasing
+    indices of the first axis, up to and including the first blocking cell.
+    """
+    lengths = np.zeros(blocking.shape, dtype=np.int64)
+    for i in range(len(blocking) - 2, -1, -1):
+        lengths[i] = np.where(blocking[i + 1], 1, lengths[i + 1] + 1)
+    return lengths
+
+
+def sight_lengths(cells):
+    """
+    Returns the (size, size, 4) table of how many cells the robot sees from each cell
+    facing each direction (see `Directions`): the empty cells in front of it and the
+    first cell holding an object (a wall, the target or a creature), which blocks the
+    rest of the view. Found with one pass over the grid per direction.
+    """
+    blocking = np.asarray(cells) != MazeGrid.OBJECT_TO_IDX["empty"]
+    lengths = np.empty(blocking.shape + (4,), dtype=np.int64)
+    # North, negative y
+    lengths[:, :, 0] = _scan_sight(blocking.T[::-1])[::-1].T
+    # East, positive x
+    lengths[:, :, 1] = _scan_sight(blocking)
+    # South, positive y
+    lengths[:, :, 2] = _scan_sight(blocking.T).T
+    # West, negative x
+    lengths[:, :, 3] = _scan_sight(blocking[::-1])[::-1]
+    return lengths
+
+
+class CorridorSight:
+    """
+    What the robot sees of the next `depth` cells in front of it in a maze, found by
+    a constant time gather from tables computed once per maze.
+
+    Cells behind the first cell holding an object are occluded: they are `OCCLUDED` in
+    the cell types returned by `get_cell_types`, and `OCCLUDED_VIEW` in the camera
+    views returned by `get_camera_views`.
+
+    The tables describe the maze as it was when they were made, so new ones are needed
+    once its `version` changes.
+    """
+
+    def __init__(self, maze, depth):
+        self.depth = depth
+        self.cells = maze.cells
+        self.lengths = sight_lengths(maze.cells)
+
+        # Camera view of every cell, with the occluded view last
+        views, self.view_indices = maze.get_camera_view_table()
+        self.views = np.concatenate([views, OCCLUDED_VIEW[np.newaxis]])
+
+        # Offsets of the cells in view from the robot, for each direction
+        self._offsets = (
+            DIRECTION_VECTORS[:, np.newaxis]
+            * np.arange(1, depth + 1)[np.newaxis, :, np.newaxis]
+        )
+        self._steps = np.arange(depth)
+
+    def _ray(self, x, y, direction):
+        """
+        Returns the coordinates of the cells in view, kept inside the grid, and
+        whether each one is visible.
+        """
+        positions = np.clip(self._offsets[direction] + (x, y), 0, len(self.cells) - 1).T
+        return positions, self._steps < self.lengths[x, y, direction]
+
+    def get_cell_types(self, x, y, direction, out=None):
+        """
+        Returns the object type of each cell in view from the given state as a (depth,)
+        uint8 array, or `OCCLUDED`.
+        """
+        (xs, ys), visible = self._ray(x, y, direction)
+        if out is None:
+            out = np.empty(self.depth, dtype=np.uint8)
+        np.copyto(out, np.where(visible, self.cells[xs, ys], OCCLUDED))
+        return out
+
+    def get_camera_views(self, x, y, direction, out=None):
+        """
+        Returns the camera view of each cell in view from the given state as a
+        (depth, 20, 20) uint8 array, or the occluded view.
+        """
+        (xs, ys), visible = self._ray(x, y, direction)
+        view_indices = np.where(visible, self.view_indices[xs, ys], len(self.views) - 1)
+        if out is None:
+            return self.views[view_indices]
+        np.take(self.views, view_indices, axis=0, out=out)
+        return out
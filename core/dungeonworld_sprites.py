@@ -0,0 +1,143 @@
+"""
+Sprite atlas holding the images of every creature species found in `images/`.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from .dungeonworld_stats import EnvStats
+
+# Directory containing one sub-directory of images per species
+IMAGES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images"
+)
+
+# Location the atlas is cached at, so it only has to be decoded from PNGs once
+ATLAS_CACHE_PATH = os.path.join(IMAGES_DIR, "sprite_atlas.npy")
+
+# Species in the order they are stored in the atlas
+SPECIES = ("halfling", "human", "lizard", "orc", "wingedbat")
+
+# Map of species to their index in the atlas
+SPECIES_TO_IDX = {species: i for i, species in enumerate(SPECIES)}
+
+# Number of images per species and the shape of each image
+NUM_SPRITES = 100
+SPRITE_SHAPE = (20, 20)
+
+# The process wide atlas, loaded on first use
+_atlas = None
+
+# Time spent loading and building the process wide atlas, how many times it was loaded
+# and how many sprites were taken from it
+ATLAS_STATS = EnvStats()
+
+# Stats sprite loads are counted in, or None while instrumentation is turned off
+_sprite_load_stats = None
+
+
+def build_sprite_atlas(images_dir=IMAGES_DIR):
+    """
+    Decodes every species image into a single contiguous (species, 100, 20, 20) uint8 array.
+    """
+    # PIL is only needed to decode the images, so it is not imported until then
+    from PIL import Image
+
+    atlas = np.empty((len(SPECIES), NUM_SPRITES) + SPRITE_SHAPE, dtype=np.uint8)
+    for species_idx, species in enumerate(SPECIES):
+        for image_id in range(NUM_SPRITES):
+            path = os.path.join(
+                images_dir, species, "{}_{}.png".format(species, str(image_id).zfill(3))
+            )
+            with Image.open(path) as im:
+                image = np.asarray(im)
+            assert image.shape == SPRITE_SHAPE, f"Unexpected sprite shape in {path}"
+            atlas[species_idx, image_id] = image
+    return atlas
+
+
+def save_sprite_atlas(atlas, path=None):
+    """
+    Writes the atlas to a .npy file. The file is written under a temporary name and
+    then moved into place, so concurrent processes never read a partial atlas.
+    """
+    if path is None:
+        path = ATLAS_CACHE_PATH
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "wb") as f:
+        np.save(f, atlas)
+    os.replace(temp_path, path)
+
+
+def load_sprite_atlas(path=None, mmap=True):
+    """
+    Loads an atlas written by `save_sprite_atlas`. By default the file is memory-mapped
+    read-only, so every process using it shares the same pages of the page cache.
+    """
+    if path is None:
+        path = ATLAS_CACHE_PATH
+    atlas = np.load(path, mmap_mode="r" if mmap else None)
+    assert atlas.shape == (len(SPECIES), NUM_SPRITES) + SPRITE_SHAPE
+    assert atlas.dtype == np.uint8
+    return atlas
+
+
+def get_sprite_atlas():
+    """
+    Returns the process wide sprite atlas.
+
+    The atlas is memory-mapped from `ATLAS_CACHE_PATH` if it exists. Otherwise it is
+    built from the PNG images and written to the cache, falling back to keeping it
+    in memory if the cache cannot be written. Delete the cache file if the images change.
+    """
+    global _atlas
+    if _atlas is None:
+        start = time.perf_counter()
+        if os.path.exists(ATLAS_CACHE_PATH):
+            _atlas = load_sprite_atlas()
+            ATLAS_STATS.add_time("sprite_atlas_load", time.perf_counter() - start)
+            ATLAS_STATS.count("sprite_atlas_loads")
+        else:
+            atlas = build_sprite_atlas()
+            ATLAS_STATS.add_time("sprite_atlas_build", time.perf_counter() - start)
+            ATLAS_STATS.count("sprite_atlas_loads")
+            try:
+                save_sprite_atlas(atlas)
+                _atlas = load_sprite_atlas()
+            except OSError:
+                atlas.flags.writeable = False
+                _atlas = atlas
+    return _atlas
+
+
+def atlas_stats():
+    """
+    Returns the process wide timings of loading or building the atlas and the counts of
+    atlas loads and sprites taken from it while instrumentation is on (see
+    `instrument_sprite_loads`), as described in `EnvStats.snapshot`. They
+    are kept apart from the stats of each environment, as every environment in the
+    process shares the one atlas.
+    """
+    return ATLAS_STATS.snapshot()
+
+
+def instrument_sprite_loads(enabled=True):
+    """
+    Turns counting the sprites taken from the atlas in `ATLAS_STATS` on or off. Creating
+    an instrumented `DungeonMazeEnv` turns it on. While it is off, `get_sprite` only
+    checks for None, like the other instrumented code.
+    """
+    global _sprite_load_stats
+    _sprite_load_stats = ATLAS_STATS if enabled else None
+
+
+def get_sprite(species, image_id):
+    """
+    Returns a read-only view of the image of the given species and image id in the atlas.
+    """
+    assert image_id >= 0 and image_id < NUM_SPRITES
+    if _sprite_load_stats is not None:
+        _sprite_load_stats.count("sprite_loads")
+    return get_sprite_atlas()[SPECIES_TO_IDX[species], image_id]
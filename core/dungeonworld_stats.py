@@ -0,0 +1,69 @@
+"""
+Opt-in timers and counters for the hot paths of the environment.
+"""
+
+
+class EnvStats:
+    """
+    Accumulates the number of calls and total time spent in named phases
+    (e.g. "maze_generation" or "camera_view") and named event counters (e.g. "wall_bumps").
+
+    Code being instrumented holds either an `EnvStats` or None, and checks for None before
+    timing, so instrumentation costs next to nothing when it is turned off.
+    """
+
+    def __init__(self):
+        self.phase_calls = {}
+        self.phase_times = {}
+        self.counters = {}
+
+    def add_time(self, phase, seconds):
+        """Records one call to a phase that took the given number of seconds."""
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+
+    def count(self, name, n=1):
+        """Adds `n` to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def clear(self):
+        """Resets all phases and counters."""
+        self.phase_calls.clear()
+        self.phase_times.clear()
+        self.counters.clear()
+
+    def snapshot(self):
+        """
+        Returns the statistics as a dictionary with "phases", mapping each phase to its
+        "calls", "total_time" and "mean_time", and "counters".
+        """
+        return _make_snapshot(self.phase_calls, self.phase_times, self.counters)
+
+
+def _make_snapshot(phase_calls, phase_times, counters):
+    return {
+        "phases": {
+            phase: {
+                "calls": calls,
+                "total_time": phase_times[phase],
+                "mean_time": phase_times[phase] / calls,
+            }
+            for phase, calls in phase_calls.items()
+        },
+        "counters": dict(counters),
+    }
+
+
+def aggregate_stats(snapshots):
+    """
+    Combines the snapshots of many environments (as returned by `EnvStats.snapshot` or
+    `DungeonMazeEnv.stats`) into one, summing calls, times and counters.
+    """
+    phase_calls, phase_times, counters = {}, {}, {}
+    for snapshot in snapshots:
+        for phase, phase_stats in snapshot["phases"].items():
+            phase_calls[phase] = phase_calls.get(phase, 0) + phase_stats["calls"]
+            phase_times[phase] = phase_times.get(phase, 0.0) + phase_stats["total_time"]
+        for name, value in snapshot["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+    return _make_snapshot(phase_calls, phase_times, counters)
@@ -0,0 +1,289 @@
+"""
+Compact columnar logs of episodes, for offline learning.
+
+A log is a directory of `chunk_00000.npz`, `chunk_00001.npz`, ... files written with
+`np.savez_compressed`. Every chunk holds a block of records, one per reset or step,
+
+    episode           int64, episode number
+    action            int8, action taken, or -1 for the observation returned by reset
+    reward            float32
+    robot_position    (n, 2) int16
+    robot_direction   int8
+    view_type         uint8, object type in front of the robot (see `MazeGrid.OBJECT_TO_IDX`)
+    view_image_id     uint8, image id of the creature in front of the robot, else 0
+    terminated        bool
+    truncated         bool
+
+and the episodes started in the chunk,
+
+    episode_number        int64
+    episode_maze_index    int64, index of the maze in the maze corpus, or -1
+    episode_target        (e, 2) int16, target position
+    episode_maze          int64, row of `mazes` holding the maze, or -1 if it is in a corpus
+    mazes                 (m, size, size) uint8, encoded mazes not taken from a corpus
+                          as they are, i.e. generated or with creatures added
+    maze_sprites          (m, size, size) uint8, image ids of the creatures in `mazes`
+
+Camera views are stored as the type and image id of the object in front of the robot,
+which is enough to rebuild them exactly with `get_camera_view`.
+"""
+
+import glob
+import os
+
+import numpy as np
+
+from .dungeonworld_grid import MazeGrid
+from .dungeonworld_objects import get_camera_view
+
+# Number of records held in memory before they are written out as a chunk
+DEFAULT_CHUNK_SIZE = 65536
+
+# Action recorded for the observation returned by reset
+RESET_ACTION = -1
+
+RECORD_COLUMNS = {
+    "episode": (np.int64, ()),
+    "action": (np.int8, ()),
+    "reward": (np.float32, ()),
+    "robot_position": (np.int16, (2,)),
+    "robot_direction": (np.int8, ()),
+    "view_type": (np.uint8, ()),
+    "view_image_id": (np.uint8, ()),
+    "terminated": (np.bool_, ()),
+    "truncated": (np.bool_, ()),
+}
+
+
+def _chunk_paths(path):
+    """
+    Paths of the chunks of the log at `path`, in order.
+    """
+    return sorted(glob.glob(os.path.join(path, "chunk_*.npz")))
+
+
+class TrajectoryWriter:
+    """
+    Buffers records in preallocated columns and writes them to the log directory at
+    `path` as compressed chunks of `chunk_size` records.
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        os.makedirs(path, exist_ok=True)
+        assert not _chunk_paths(path), f"{path} already holds a trajectory log"
+        self.path = path
+        self.chunk_size = chunk_size
+        self.num_chunks = 0
+        self.num_episodes = 0
+        self._columns = {
+            name: np.empty((chunk_size,) + shape, dtype=dtype)
+            for name, (dtype, shape) in RECORD_COLUMNS.items()
+        }
+        self._num_records = 0
+        self._episodes = []
+        self._mazes = []
+        self._maze_sprites = []
+
+    def start_episode(
+        self, target_position, maze_index=None, maze_cells=None, maze_sprites=None
+    ):
+        """
+        Starts a new episode played in maze `maze_index` of a maze corpus, or in the
+        encoded maze `maze_cells` with the creature image ids `maze_sprites` (see
+        `MazeGrid.encode_sprites_to_array`), or both when creatures were added to a
+        corpus maze. Returns the episode number.
+        """
+        assert maze_index is not None or maze_cells is not None
+        if maze_cells is None:
+            maze_row = -1
+        else:
+            maze_row = len(self._mazes)
+            self._mazes.append(np.array(maze_cells, dtype=np.uint8))
+            if maze_sprites is None:
+                self._maze_sprites.append(np.zeros_like(self._mazes[-1]))
+            else:
+                self._maze_sprites.append(np.array(maze_sprites, dtype=np.uint8))
+        self._episodes.append(
+            (
+                self.num_episodes,
+                -1 if maze_index is None else maze_index,
+                tuple(target_position),
+                maze_row,
+            )
+        )
+        self.num_episodes += 1
+        return self.num_episodes - 1
+
+    def add_record(
+        self,
+        action,
+        reward,
+        robot_position,
+        robot_direction,
+        view_type,
+        view_image_id,
+        terminated=False,
+        truncated=False,
+    ):
+        """
+        Adds the record of a reset (with action `RESET_ACTION`) or step to the
+        current episode.
+        """
+        assert self.num_episodes > 0, "Start an episode before adding records"
+        i = self._num_records
+        columns = self._columns
+        columns["episode"][i] = self.num_episodes - 1
+        columns["action"][i] = action
+        columns["reward"][i] = reward
+        columns["robot_position"][i] = robot_position
+        columns["robot_direction"][i] = robot_direction
+        columns["view_type"][i] = view_type
+        columns["view_image_id"][i] = view_image_id
+        columns["terminated"][i] = terminated
+        columns["truncated"][i] = truncated
+        self._num_records += 1
+        if self._num_records == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records and episodes out as a chunk.
+        """
+        if self._num_records == 0 and not self._episodes:
+            return
+        episodes = list(zip(*self._episodes)) if self._episodes else [(), (), (), ()]
+        numbers, maze_indices, targets, maze_rows = episodes
+        if self._mazes:
+            mazes = np.stack(self._mazes)
+            maze_sprites = np.stack(self._maze_sprites)
+        else:
+            mazes = maze_sprites = np.zeros((0, 0, 0), dtype=np.uint8)
+        np.savez_compressed(
+            os.path.join(self.path, f"chunk_{self.num_chunks:05d}.npz"),
+            episode_number=np.array(numbers, dtype=np.int64),
+            episode_maze_index=np.array(maze_indices, dtype=np.int64),
+            episode_target=np.array(targets, dtype=np.int16).reshape(-1, 2),
+            episode_maze=np.array(maze_rows, dtype=np.int64),
+            mazes=mazes,
+            maze_sprites=maze_sprites,
+            **{
+                name: column[: self._num_records]
+                for name, column in self._columns.items()
+            },
+        )
+        self.num_chunks += 1
+        self._num_records = 0
+        self._episodes = []
+        self._mazes = []
+        self._maze_sprites = []
+
+    def close(self):
+        """
+        Writes out anything still buffered.
+        """
+        self.flush()
+
+
+class TrajectoryDataset:
+    """
+    A trajectory log loaded into memory as columns (see `RECORD_COLUMNS`), with the
+    observations rebuilt on demand without running the environment.
+
+    `maze_corpus` is the corpus the logged episodes drew their mazes from, if any.
+    """
+
+    def __init__(self, path, maze_corpus=None):
+        chunks = [np.load(chunk_path) for chunk_path in _chunk_paths(path)]
+        assert chunks, f"No trajectory log found at {path}"
+        for name in RECORD_COLUMNS:
+            setattr(self, name, np.concatenate([chunk[name] for chunk in chunks]))
+
+        # Maze rows are numbered within each chunk, so offset them
+        self.mazes = []
+        self.maze_sprites = []
+        episode_mazes = []
+        maze_offset = 0
+        for chunk in chunks:
+            rows = chunk["episode_maze"]
+            episode_mazes.append(np.where(rows >= 0, rows + maze_offset, -1))
+            if len(chunk["mazes"]):
+                self.mazes.extend(chunk["mazes"])
+                self.maze_sprites.extend(chunk["maze_sprites"])
+                maze_offset += len(chunk["mazes"])
+        self.episode_maze = np.concatenate(episode_mazes)
+        self.episode_maze_index = np.concatenate(
+            [chunk["episode_maze_index"] for chunk in chunks]
+        )
+        self.episode_target = np.concatenate(
+            [chunk["episode_target"] for chunk in chunks]
+        )
+        self.num_episodes = len(self.episode_maze)
+
+        # First record of every episode
+        self.episode_starts = np.searchsorted(
+            self.episode, np.arange(self.num_episodes + 1)
+        )
+        self.maze_corpus = maze_corpus
+
+    def __len__(self):
+        return len(self.action)
+
+    def get_episode_records(self, episode):
+        """
+        Returns the slice of records of an episode.
+        """
+        return slice(self.episode_starts[episode], self.episode_starts[episode + 1])
+
+    def get_maze(self, episode):
+        """
+        Returns the maze an episode was played in as a `MazeGrid`, with its creatures.
+        """
+        maze_row = self.episode_maze[episode]
+        if maze_row >= 0:
+            return MazeGrid.decode_maze_from_array(
+                self.mazes[maze_row], self.maze_sprites[maze_row]
+            )
+        assert self.maze_corpus is not None, "Episode maze is in a maze corpus"
+        return self.maze_corpus.get_maze(int(self.episode_maze_index[episode]))
+
+    def get_camera_views(self, records=slice(None)):
+        """
+        Rebuilds the camera views of the given records as an (n, 20, 20) uint8 array.
+        """
+        view_types = self.view_type[records]
+        view_image_ids = self.view_image_id[records]
+        views = np.empty(view_types.shape + (20, 20), dtype=np.uint8)
+        pairs, inverse = np.unique(
+            np.stack([view_types, view_image_ids]), axis=1, return_inverse=True
+        )
+        for i, (view_type, view_image_id) in enumerate(pairs.T):
+            views[inverse.ravel() == i] = get_camera_view(
+                MazeGrid.IDX_TO_OBJECT[view_type], view_image_id
+            )
+        return views
+
+    def get_observations(self, records=slice(None)):
+        """
+        Rebuilds the observations of the given records, as a dictionary of stacked
+        arrays laid out like the observations of `DungeonMazeEnv`.
+        """
+        return {
+            "robot_position": self.robot_position[records].astype(int),
+            "robot_direction": self.robot_direction[records].astype(int),
+            "robot_camera_view": self.get_camera_views(records),
+            "target_position": self.episode_target[self.episode[records]].astype(int),
+        }
+
+    def get_observation(self, record):
+        """
+        Rebuilds the observation of a single record.
+        """
+        return {
+            "robot_position": self.robot_position[record].astype(int),
+            "robot_direction": int(self.robot_direction[record]),
+            "robot_camera_view": get_camera_view(
+                MazeGrid.IDX_TO_OBJECT[self.view_type[record]],
+                self.view_image_id[record],
+            ),
+            "target_position": self.episode_target[self.episode[record]].astype(int),
+        }
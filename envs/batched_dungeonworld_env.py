@@ -0,0 +1,178 @@
+"""
+Batched MazeDungeon Environment stepping many mazes at once with NumPy.
+"""
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.utils import seeding
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space
+
+from core.dungeonworld_grid import DIRECTION_VECTORS, MazeGrid
+from core.dungeonworld_objects import EMPTY_VIEW, TARGET_VIEW, WALL_VIEW
+from envs.simple_dungeonworld_env import Actions, Directions
+
+# Camera view for each object type index that can appear in a generated maze,
+# i.e. empty, wall and target.
+CAMERA_VIEWS = np.stack([EMPTY_VIEW, WALL_VIEW, TARGET_VIEW])
+
+
+class BatchedDungeonMazeEnv(gym.vector.VectorEnv):
+    """
+    N independent 2D maze grid world environments stepped together.
+
+    The mazes are held as one (N, size, size) uint8 tensor of encoded object types
+    (see `MazeGrid.OBJECT_TO_IDX`) and the robots as integer position and direction
+    arrays, so every step is a handful of NumPy operations regardless of N.
+
+    Each sub-environment owns its own random number generator and produces exactly
+    the same mazes, observations, rewards and terminations as a separate
+    `DungeonMazeEnv` reset with the same seed. Terminated sub-environments are
+    reset on the following call to `step`, where their action is ignored.
+    """
+
+    metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(self, num_envs, grid_size=16):
+        """
+        Initialises `num_envs` simulation environments with the given grid size.
+        """
+        self.num_envs = num_envs
+        self.grid_size = grid_size
+        self.render_mode = None
+
+        # Same layout as the `DungeonMazeEnv` action and observation spaces
+        self.single_action_space = spaces.Discrete(len(Actions))
+        self.single_observation_space = spaces.Dict(
+            {
+                "robot_position": spaces.Box(0, grid_size - 1, shape=(2,), dtype=int),
+                "robot_direction": spaces.Discrete(len(Directions)),
+                "robot_camera_view": spaces.Box(
+                    low=0, high=255, shape=(20, 20), dtype=np.uint8
+                ),
+                "target_position": spaces.Box(0, grid_size - 1, shape=(2,), dtype=int),
+            }
+        )
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        # One random number generator per sub-environment, created on first reset
+        self.np_randoms = [None] * num_envs
+
+        self.mazes = np.zeros((num_envs, grid_size, grid_size), dtype=np.uint8)
+        self.robot_positions = np.zeros((num_envs, 2), dtype=int)
+        self.robot_directions = np.zeros(num_envs, dtype=int)
+        self.target_positions = np.full((num_envs, 2), grid_size - 2, dtype=int)
+        self.robot_camera_views = np.zeros((num_envs, 20, 20), dtype=np.uint8)
+
+        # Sub-environments that terminated on the previous step and need a reset
+        self._autoreset_envs = np.zeros(num_envs, dtype=bool)
+        self._env_indices = np.arange(num_envs)
+
+    def get_observations(self):
+        """
+        Returns a dictionary containing the stacked robot positions, directions and
+        camera views and the target positions.
+        """
+        return {
+            "robot_position": self.robot_positions.copy(),
+            "robot_direction": self.robot_directions.copy(),
+            "robot_camera_view": self.robot_camera_views.copy(),
+            "target_position": self.target_positions.copy(),
+        }
+
+    def _update_camera_views(self, env_indices):
+        """
+        Looks up the camera view for the cell in front of each of the given robots.
+        """
+        front = (
+            self.robot_positions[env_indices]
+            + DIRECTION_VECTORS[self.robot_directions[env_indices]]
+        )
+        front_cells = self.mazes[env_indices, front[:, 0], front[:, 1]]
+        self.robot_camera_views[env_indices] = CAMERA_VIEWS[front_cells]
+
+    def _reset_envs(self, env_indices):
+        """
+        Generates a new maze for each of the given sub-environments using its own
+        random number generator and places the robot at the maze entrance.
+        """
+        for i in env_indices:
+            maze = MazeGrid(size=self.grid_size, empty=False, np_rng=self.np_randoms[i])
+            self.mazes[i] = maze.encode_maze_to_array()
+
+        self.robot_positions[env_indices] = (1, 1)
+        self.robot_directions[env_indices] = Directions.south
+        self._update_camera_views(env_indices)
+
+    def reset(self, seed=None, options=None):
+        """
+        Initialises every sub-environment for a new episode with a randomly generated maze.
+
+        `seed` may be a single integer, in which case sub-environment i is seeded with
+        `seed + i`, or a list with one seed (or None) per sub-environment.
+        """
+        if seed is None:
+            seed = [None] * self.num_envs
+        elif isinstance(seed, (int, np.integer)):
+            seed = [int(seed) + i for i in range(self.num_envs)]
+        assert len(seed) == self.num_envs
+
+        for i, env_seed in enumerate(seed):
+            if env_seed is not None or self.np_randoms[i] is None:
+                self.np_randoms[i], _ = seeding.np_random(env_seed)
+
+        self._reset_envs(self._env_indices)
+        self._autoreset_envs[:] = False
+
+        return self.get_observations(), {}
+
+    def step(self, actions):
+        """
+        Performs one step of every sub-environment with the given vector of actions.
+        Returning the new stacked states, rewards and whether each episode has terminated.
+        """
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_envs,)
+        assert np.all((actions >= 0) & (actions < len(Actions))), "unknown action"
+
+        rewards = np.full(self.num_envs, -1.0)
+
+        # Get the contents of the cell in front of each robot
+        front = self.robot_positions + DIRECTION_VECTORS[self.robot_directions]
+        front_cells = self.mazes[self._env_indices, front[:, 0], front[:, 1]]
+
+        # Sub-environments being reset this step ignore their action
+        stepping = ~self._autoreset_envs
+
+        # Attempt actions
+        turn_left = stepping & (actions == Actions.turn_left)
+        turn_right = stepping & (actions == Actions.turn_right)
+        self.robot_directions = (self.robot_directions - turn_left + turn_right) % 4
+
+        move_forwards = stepping & (actions == Actions.move_forwards)
+        can_move = move_forwards & MazeGrid.OBJECT_CAN_OVERLAP[front_cells]
+        self.robot_positions[can_move] = front[can_move]
+        # Zero reward as robot tried to crash into an object in the cell in front.
+        rewards[move_forwards & ~can_move] = 0
+
+        # An episode is terminated if the agent has reached the target
+        terminations = stepping & np.all(
+            self.robot_positions == self.target_positions, axis=1
+        )
+
+        # Update the robots' camera views
+        self._update_camera_views(self._env_indices[stepping])
+
+        # Reset the sub-environments that terminated on the previous step
+        resetting = self._env_indices[self._autoreset_envs]
+        if len(resetting) > 0:
+            self._reset_envs(resetting)
+            rewards[resetting] = 0
+
+        truncations = np.zeros(self.num_envs, dtype=bool)
+        self._autoreset_envs = terminations | truncations
+
+        return self.get_observations(), rewards, terminations, truncations, {}
@@ -0,0 +1,91 @@
+"""
+Wrapper replacing the robot's primitive actions with corridor following macro-actions.
+"""
+
+import gymnasium as gym
+from gymnasium import spaces
+
+from core.dungeonworld_junctions import NO_EDGE, NO_NODE, JunctionGraph
+from envs.simple_dungeonworld_env import Actions, Directions
+
+# Primitive turns taking the robot from facing one direction to another,
+# indexed by the difference of the directions modulo 4
+TURNS = (
+    (),
+    (Actions.turn_right,),
+    (Actions.turn_right, Actions.turn_right),
+    (Actions.turn_left,),
+)
+
+
+class CorridorMacroActionWrapper(gym.Wrapper):
+    """
+    Wraps a `DungeonMazeEnv` so each action is a direction (see `Directions`) in which
+    the robot follows the corridor from its junction to the next junction, dead end or
+    the target (see `JunctionGraph`), turning as needed.
+
+    The primitive actions are played in the wrapped environment, so the reward of a
+    macro-action is the total reward of its primitive steps, and the observation is
+    the one after the last of them. The macro-action stops early if the episode
+    terminates, and the number of primitive steps taken is returned in the info
+    dictionary as "primitive_steps". Heading into a wall turns the robot to face it and
+    bumps into it once.
+
+    Episodes on large mazes take tens of macro-actions rather than thousands of steps.
+    The junction graph of the current maze is available as `graph`.
+    """
+
+    def __init__(self, env):
+        super().__init__(env)
+        self.action_space = spaces.Discrete(len(Directions))
+        self.graph = None
+        self._graph_version = None
+
+    def _update_graph(self):
+        """
+        Builds the junction graph of the wrapped environment's maze, unless it is the
+        maze the current graph was built for.
+        """
+        env = self.env.unwrapped
+        if self._graph_version != env.maze.version:
+            self.graph = JunctionGraph(env.maze, target_position=env.target_position)
+            self._graph_version = env.maze.version
+        return env
+
+    def reset(self, seed=None, options=None):
+        observation, info = self.env.reset(seed=seed, options=options)
+        self._update_graph()
+        return observation, info
+
+    def step(self, action):
+        # The maze may have been replaced or changed since the last call
+        env = self._update_graph()
+        node = self.graph.get_node(*env.robot_position.tolist())
+        if node == NO_NODE:
+            raise ValueError(
+                f"Robot at {env.robot_position.tolist()} is not on a junction graph "
+                "node, so no corridor macro-action can start there"
+            )
+        edge = self.graph.edge_from[node, action]
+        moves = [action] if edge == NO_EDGE else self.graph.get_edge_path(edge).tolist()
+
+        # Turn to face the direction of each move, then move forwards
+        primitive_actions = []
+        direction = int(env.robot_direction)
+        for move in moves:
+            primitive_actions += TURNS[(move - direction) % 4] + (
+                Actions.move_forwards,
+            )
+            direction = move
+
+        total_reward = 0
+        for primitive_steps, primitive_action in enumerate(primitive_actions, 1):
+            observation, reward, terminated, truncated, info = self.env.step(
+                primitive_action
+            )
+            total_reward += reward
+            if terminated or truncated:
+                break
+
+        info["primitive_steps"] = primitive_steps
+        return observation, total_reward, terminated, truncated, info
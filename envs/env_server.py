@@ -0,0 +1,269 @@
+"""
+Server hosting many MazeDungeon environments for agents in other processes.
+
+The server listens on a Unix domain socket. Every message in either direction is a
+uint32 length followed by that many bytes. A request is a `REQUEST_HEADER` holding the
+command and the number of environments, followed by one `RESET_DTYPE` or `STEP_DTYPE`
+record per environment. The response is a `RESPONSE_HEADER` holding the status and
+the number of records, followed by one `RESULT_DTYPE` record per environment in the
+order they were requested, or by an error message if the status is `STATUS_ERROR`.
+"""
+
+import asyncio
+import socket
+import struct
+import threading
+
+import numpy as np
+
+from envs.simple_dungeonworld_env import Actions, DungeonMazeEnv
+
+# Commands
+RESET = 1
+STEP = 2
+
+# Number of actions a step record can hold
+NUM_ACTIONS = len(Actions)
+
+# Response status
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+LENGTH_FORMAT = "<I"
+REQUEST_HEADER = "<BxxxI"
+RESPONSE_HEADER = "<BxxxI"
+
+# Request records, a seed of -1 resets without seeding
+RESET_DTYPE = np.dtype([("env_id", "<u4"), ("seed", "<i8")])
+STEP_DTYPE = np.dtype([("env_id", "<u4"), ("action", "u1")])
+
+# Response records
+RESULT_DTYPE = np.dtype(
+    [
+        ("env_id", "<u4"),
+        ("robot_position", "<i4", (2,)),
+        ("robot_direction", "u1"),
+        ("robot_camera_view", "u1", (20, 20)),
+        ("target_position", "<i4", (2,)),
+        ("reward", "<f4"),
+        ("terminated", "?"),
+        ("truncated", "?"),
+    ]
+)
+
+OBSERVATION_KEYS = (
+    "robot_position",
+    "robot_direction",
+    "robot_camera_view",
+    "target_position",
+)
+
+
+def _frame(payload):
+    """
+    Prefixes a message with its length.
+    """
+    return struct.pack(LENGTH_FORMAT, len(payload)) + payload
+
+
+class DungeonMazeEnvServer:
+    """
+    Hosts `num_envs` `DungeonMazeEnv`s, created with `env_kwargs`, behind the Unix
+    domain socket at `path`. Clients address the environments by id, 0 to num_envs - 1,
+    and can reset or step any number of them in one request.
+
+    Requests are handled one at a time on an asyncio event loop, so many clients can be
+    connected at once. Each environment should only be used by one client.
+
+    Results carry the image observation (see `RESULT_DTYPE`), so `env_kwargs` must not
+    change the observations.
+    """
+
+    def __init__(self, path, num_envs, **env_kwargs):
+        if env_kwargs.get("observation_mode", "image") != "image":
+            raise ValueError(
+                "DungeonMazeEnvServer only sends the image observation, "
+                f"not observation_mode={env_kwargs['observation_mode']!r}"
+            )
+        if env_kwargs.get("corridor_view_depth") is not None:
+            raise ValueError(
+                "DungeonMazeEnvServer does not send the corridor view, "
+                "so corridor_view_depth must not be given"
+            )
+        self.path = path
+        self.envs = [DungeonMazeEnv(**env_kwargs) for _ in range(num_envs)]
+        self.ready = threading.Event()
+        self._loop = None
+        self._stopped = None
+
+    def _reset(self, records, results):
+        for result, (env_id, seed) in zip(results, records.tolist()):
+            observation, _ = self.envs[env_id].reset(seed=None if seed < 0 else seed)
+            for key in OBSERVATION_KEYS:
+                result[key] = observation[key]
+
+    def _step(self, records, results):
+        for result, (env_id, action) in zip(results, records.tolist()):
+            observation, reward, terminated, truncated, _ = self.envs[env_id].step(
+                action
+            )
+            for key in OBSERVATION_KEYS:
+                result[key] = observation[key]
+            result["reward"] = reward
+            result["terminated"] = terminated
+            result["truncated"] = truncated
+
+    def _parse_request(self, request):
+        """
+        Returns the command and records of a request, checking every record before
+        any environment is reset or stepped.
+        """
+        header_size = struct.calcsize(REQUEST_HEADER)
+        if len(request) < header_size:
+            raise ValueError("Request is shorter than its header")
+        command, count = struct.unpack_from(REQUEST_HEADER, request)
+        if command not in (RESET, STEP):
+            raise ValueError(f"Unknown command {command}")
+        record_dtype = RESET_DTYPE if command == RESET else STEP_DTYPE
+        if len(request) != header_size + count * record_dtype.itemsize:
+            raise ValueError(f"Request does not hold {count} records")
+        records = np.frombuffer(
+            request, dtype=record_dtype, count=count, offset=header_size
+        )
+        if np.any(records["env_id"] >= len(self.envs)):
+            raise ValueError("Unknown env id")
+        if command == STEP:
+            if np.any(records["action"] >= NUM_ACTIONS):
+                raise ValueError("Unknown action")
+            for env_id in np.unique(records["env_id"]).tolist():
+                if self.envs[env_id].maze is None:
+                    raise ValueError(f"Env {env_id} has not been reset")
+        return command, records
+
+    def handle_request(self, request):
+        """
+        Carries out a request, returning the response. Malformed requests, and
+        requests with any unknown env id or action or stepping any env that has not
+        been reset, get an error response without changing any environment.
+        """
+        try:
+            command, records = self._parse_request(request)
+            results = np.zeros(len(records), dtype=RESULT_DTYPE)
+            results["env_id"] = records["env_id"]
+            if command == RESET:
+                self._reset(records, results)
+            else:
+                self._step(records, results)
+        except Exception as error:
+            header = struct.pack(RESPONSE_HEADER, STATUS_ERROR, 0)
+            return header + repr(error).encode()
+        return struct.pack(RESPONSE_HEADER, STATUS_OK, len(records)) + results.tobytes()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                length_bytes = await reader.readexactly(struct.calcsize(LENGTH_FORMAT))
+                request = await reader.readexactly(
+                    struct.unpack(LENGTH_FORMAT, length_bytes)[0]
+                )
+                writer.write(_frame(self.handle_request(request)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """
+        Serves clients until `stop` is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+        self.ready.set()
+        async with server:
+            await self._stopped.wait()
+
+    def run(self):
+        """
+        Serves clients on a new event loop, blocking until `stop` is called.
+        """
+        asyncio.run(self.serve())
+
+    def stop(self):
+        """
+        Stops serving. Can be called from any thread.
+        """
+        self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+class DungeonMazeEnvClient:
+    """
+    Connects to a `DungeonMazeEnvServer` at `path`.
+
+    `reset` and `step` take arrays of env ids and return dictionaries of stacked arrays,
+    with the observations under their usual keys plus "reward", "terminated" and
+    "truncated". The arrays are views of the response buffer.
+    """
+
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+
+    def _receive_exactly(self, num_bytes):
+        buffer = bytearray(num_bytes)
+        view = memoryview(buffer)
+        while view:
+            received = self.socket.recv_into(view)
+            if received == 0:
+                raise ConnectionError("Server closed the connection")
+            view = view[received:]
+        return buffer
+
+    def _request(self, command, records):
+        request = struct.pack(REQUEST_HEADER, command, len(records)) + records.tobytes()
+        self.socket.sendall(_frame(request))
+        length = struct.unpack(
+            LENGTH_FORMAT, self._receive_exactly(struct.calcsize(LENGTH_FORMAT))
+        )[0]
+        response = self._receive_exactly(length)
+        status, count = struct.unpack_from(RESPONSE_HEADER, response)
+        header_size = struct.calcsize(RESPONSE_HEADER)
+        if status != STATUS_OK:
+            raise RuntimeError(bytes(response[header_size:]).decode())
+        results = np.frombuffer(
+            response, dtype=RESULT_DTYPE, count=count, offset=header_size
+        )
+        return {name: results[name] for name in RESULT_DTYPE.names}
+
+    def reset(self, env_ids, seeds=None):
+        """
+        Resets the given environments, seeding them with `seeds` if given.
+        """
+        records = np.empty(len(env_ids), dtype=RESET_DTYPE)
+        records["env_id"] = env_ids
+        records["seed"] = -1 if seeds is None else seeds
+        return self._request(RESET, records)
+
+    def step(self, env_ids, actions):
+        """
+        Steps the given environments with the corresponding actions.
+        """
+        records = np.empty(len(env_ids), dtype=STEP_DTYPE)
+        records["env_id"] = env_ids
+        records["action"] = actions
+        return self._request(STEP, records)
+
+    def close(self):
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve MazeDungeon environments.")
+    parser.add_argument("path", help="path of the Unix domain socket to listen on")
+    parser.add_argument("--num-envs", type=int, default=16)
+    parser.add_argument("--grid-size", type=int, default=16)
+    args = parser.parse_args()
+    DungeonMazeEnvServer(args.path, args.num_envs, grid_size=args.grid_size).run()
@@ -0,0 +1,153 @@
+"""
+MazeDungeon Environment with many HeroBots exploring the same maze.
+"""
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium import spaces
+
+from core.dungeonworld_grid import DIRECTION_VECTORS, MAZE_ALGORITHMS, MazeGrid
+from envs.simple_dungeonworld_env import Actions, Directions
+
+
+class MultiRobotDungeonMazeEnv(gym.Env):
+    """
+    `num_robots` robots in one 2D maze grid world, all stepped at once.
+
+    The maze is shared by every robot, and the robots are held as (K, 2) position and
+    (K,) direction arrays, so memory grows with the number of robots rather than with
+    the number of robots times the size of the maze. Robots do not block each other.
+
+    Actions, observations, rewards and terminations are per robot: each step takes
+    one action per robot, and returns the stacked robot positions, directions and
+    camera views, a reward per robot and whether each robot has reached the target.
+    Robots that have reached the target stay there, ignore their actions and get zero
+    reward. Every robot starts at [1,1] facing south, and the maze is the one a
+    `DungeonMazeEnv` would generate with the same seed.
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(
+        self, num_robots, grid_size=16, maze_algorithm="dfs", creature_counts=None
+    ):
+        """
+        Initialises the simulation environment for `num_robots` robots with the given
+        grid size. `maze_algorithm` and `creature_counts` are as for `DungeonMazeEnv`.
+        """
+        self.num_robots = num_robots
+        self.grid_size = grid_size
+        assert maze_algorithm in MAZE_ALGORITHMS
+        self.maze_algorithm = maze_algorithm
+        self.creature_counts = creature_counts
+        self.render_mode = None
+        self.maze = None
+
+        self.action_space = spaces.MultiDiscrete([len(Actions)] * num_robots)
+        self.observation_space = spaces.Dict(
+            {
+                "robot_position": spaces.Box(
+                    0, grid_size - 1, shape=(num_robots, 2), dtype=int
+                ),
+                "robot_direction": spaces.MultiDiscrete([len(Directions)] * num_robots),
+                "robot_camera_view": spaces.Box(
+                    low=0, high=255, shape=(num_robots, 20, 20), dtype=np.uint8
+                ),
+                "target_position": spaces.Box(0, grid_size - 1, shape=(2,), dtype=int),
+            }
+        )
+
+        self.robot_positions = np.zeros((num_robots, 2), dtype=int)
+        self.robot_directions = np.zeros(num_robots, dtype=int)
+        self.robot_camera_views = np.zeros((num_robots, 20, 20), dtype=np.uint8)
+        self.target_position = np.full(2, grid_size - 2, dtype=int)
+        self.terminated = np.zeros(num_robots, dtype=bool)
+
+        # Distinct camera views of the maze, and the index of each cell's view
+        self._camera_views = None
+        self._camera_view_indices = None
+
+    def get_observations(self):
+        """
+        Returns a dictionary containing the stacked robot positions, directions and
+        camera views and the target position.
+        """
+        return {
+            "robot_position": self.robot_positions.copy(),
+            "robot_direction": self.robot_directions.copy(),
+            "robot_camera_view": self.robot_camera_views.copy(),
+            "target_position": self.target_position.copy(),
+        }
+
+    def _update_camera_views(self):
+        """
+        Looks up the camera view for the cell in front of every robot.
+        """
+        front = self.robot_positions + DIRECTION_VECTORS[self.robot_directions]
+        self.robot_camera_views[:] = self._camera_views[
+            self._camera_view_indices[front[:, 0], front[:, 1]]
+        ]
+
+    def reset(self, seed=None, options=None):
+        """
+        Initialises the environment for a new episode with a randomly generated maze,
+        with every robot at position [1,1] facing south.
+        """
+        super().reset(seed=seed)
+
+        self.maze = MazeGrid(
+            size=self.grid_size,
+            empty=False,
+            np_rng=self.np_random,
+            algorithm=self.maze_algorithm,
+        )
+        if self.creature_counts:
+            self.maze.populate_creatures(self.creature_counts, np_rng=self.np_random)
+        self._camera_views, self._camera_view_indices = (
+            self.maze.get_camera_view_table()
+        )
+
+        self.robot_positions[:] = (1, 1)
+        self.robot_directions[:] = Directions.south
+        self.terminated[:] = False
+        self._update_camera_views()
+
+        return self.get_observations(), {}
+
+    def step(self, actions):
+        """
+        Performs one step of every robot with the given vector of actions.
+        Returning the new state, a reward per robot and whether each robot has
+        reached the target.
+        """
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_robots,)
+        assert np.all((actions >= 0) & (actions < len(Actions))), "unknown action"
+
+        # Robots that have reached the target ignore their action
+        stepping = ~self.terminated
+        rewards = np.where(stepping, -1.0, 0.0)
+
+        # Attempt actions
+        turn_left = stepping & (actions == Actions.turn_left)
+        turn_right = stepping & (actions == Actions.turn_right)
+        self.robot_directions = (self.robot_directions - turn_left + turn_right) % 4
+
+        # Get the contents of the cell in front of each robot moving forwards
+        move_forwards = stepping & (actions == Actions.move_forwards)
+        front = self.robot_positions + DIRECTION_VECTORS[self.robot_directions]
+        front_cells = self.maze.cells[front[:, 0], front[:, 1]]
+        can_move = move_forwards & MazeGrid.OBJECT_CAN_OVERLAP[front_cells]
+        self.robot_positions[can_move] = front[can_move]
+        # Zero reward as robot tried to crash into an object in the cell in front.
+        rewards[move_forwards & ~can_move] = 0
+
+        # A robot is done once it has reached the target
+        self.terminated |= np.all(self.robot_positions == self.target_position, axis=1)
+
+        # Update the robots' camera views
+        self._update_camera_views()
+
+        truncations = np.zeros(self.num_robots, dtype=bool)
+        return self.get_observations(), rewards, self.terminated.copy(), truncations, {}
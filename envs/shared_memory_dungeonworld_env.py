@@ -0,0 +1,306 @@
+"""
+MazeDungeon vector environment stepping its sub-environments in worker processes,
+which exchange observations with the main process through shared memory.
+"""
+
+import multiprocessing
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space
+
+from envs.simple_dungeonworld_env import DungeonMazeEnv
+
+# Commands sent to the workers
+RESET = 1
+STEP = 2
+CLOSE = 3
+
+# Arrays shared between the main process and the workers, with their dtype and the
+# shape of each sub-environment's entry
+SHARED_ARRAYS = (
+    ("robot_position", np.int64, (2,)),
+    ("robot_direction", np.int64, ()),
+    ("robot_camera_view", np.uint8, (20, 20)),
+    ("target_position", np.int64, (2,)),
+    ("reward", np.float64, ()),
+    ("terminated", np.bool_, ()),
+    ("truncated", np.bool_, ()),
+    ("action", np.int64, ()),
+    ("seed", np.int64, ()),
+    ("reset_mask", np.bool_, ()),
+)
+
+OBSERVATION_KEYS = (
+    "robot_position",
+    "robot_direction",
+    "robot_camera_view",
+    "target_position",
+)
+
+
+def _shared_array_layout(num_envs):
+    """
+    Returns the byte offset of every shared array in the shared memory block, each
+    aligned to 8 bytes, and the total size of the block.
+    """
+    offsets = {}
+    size = 0
+    for name, dtype, shape in SHARED_ARRAYS:
+        offsets[name] = size
+        nbytes = num_envs * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize
+        size += -(-nbytes // 8) * 8
+    return offsets, size
+
+
+def _shared_arrays(buffer, num_envs):
+    """
+    Returns the shared arrays as NumPy views of the shared memory buffer.
+    """
+    offsets, _ = _shared_array_layout(num_envs)
+    return {
+        name: np.ndarray(
+            (num_envs,) + shape, dtype=dtype, buffer=buffer, offset=offsets[name]
+        )
+        for name, dtype, shape in SHARED_ARRAYS
+    }
+
+
+def _write_observation(arrays, i, observation):
+    # The camera view is written into shared memory by the environment itself
+    arrays["robot_position"][i] = observation["robot_position"]
+    arrays["robot_direction"][i] = observation["robot_direction"]
+    arrays["target_position"][i] = observation["target_position"]
+
+
+def _worker(
+    connection, memory_name, num_envs, env_indices, env_kwargs, autoreset_mode, cpu
+):
+    """
+    Runs the given sub-environments, carrying out the commands received from the
+    main process on the shared arrays.
+    """
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    memory = SharedMemory(name=memory_name)
+    arrays = _shared_arrays(memory.buf, num_envs)
+    envs = {
+        i: DungeonMazeEnv(
+            camera_view_buffer=arrays["robot_camera_view"][i], **env_kwargs
+        )
+        for i in env_indices
+    }
+    needs_reset = dict.fromkeys(env_indices, False)
+
+    def reset(i, seed=None):
+        observation, _ = envs[i].reset(seed=seed)
+        _write_observation(arrays, i, observation)
+        arrays["reward"][i] = 0
+        arrays["terminated"][i] = False
+        arrays["truncated"][i] = False
+        needs_reset[i] = False
+
+    try:
+        while True:
+            command = np.frombuffer(connection.recv_bytes(), dtype=np.int32)[0]
+            try:
+                if command == RESET:
+                    for i in env_indices:
+                        if arrays["reset_mask"][i]:
+                            seed = int(arrays["seed"][i])
+                            reset(i, seed=None if seed < 0 else seed)
+                elif command == STEP:
+                    for i in env_indices:
+                        if needs_reset[i] and autoreset_mode == AutoresetMode.NEXT_STEP:
+                            reset(i)
+                            continue
+                        observation, reward, terminated, truncated, _ = envs[i].step(
+                            int(arrays["action"][i])
+                        )
+                        _write_observation(arrays, i, observation)
+                        arrays["reward"][i] = reward
+                        arrays["terminated"][i] = terminated
+                        arrays["truncated"][i] = truncated
+                        needs_reset[i] = terminated or truncated
+                elif command == CLOSE:
+                    connection.send_bytes(b"")
+                    break
+            except Exception as error:
+                connection.send_bytes(repr(error).encode())
+            else:
+                connection.send_bytes(b"")
+    finally:
+        # Drop the views of the shared memory so it can be closed
+        arrays.clear()
+        envs.clear()
+        memory.close()
+
+
+class SharedMemoryDungeonMazeEnv(gym.vector.VectorEnv):
+    """
+    `num_envs` `DungeonMazeEnv`s split between `num_workers` worker processes.
+
+    Observations, rewards, terminations and actions live in one block of shared memory,
+    which the workers read and write in place. The main process only sends each worker
+    a one integer command per call, so no observations are pickled.
+
+    `autoreset_mode` is `AutoresetMode.NEXT_STEP`, where terminated sub-environments are
+    reset on the following call to `step` and their action is ignored, as in
+    `BatchedDungeonMazeEnv`, or `AutoresetMode.DISABLED`, where they are only reset by
+    `reset(options={"reset_mask": mask})`.
+
+    If `pin_workers` is True, worker i is pinned to the i-th CPU available to the main
+    process (where `os.sched_setaffinity` is supported). Other keyword arguments are
+    passed to every `DungeonMazeEnv`, except those changing its observations, since
+    only the image observation is shared.
+    """
+
+    def __init__(
+        self,
+        num_envs,
+        grid_size=16,
+        num_workers=None,
+        autoreset_mode=AutoresetMode.NEXT_STEP,
+        pin_workers=False,
+        context=None,
+        **env_kwargs,
+    ):
+        assert autoreset_mode in (AutoresetMode.NEXT_STEP, AutoresetMode.DISABLED)
+        if env_kwargs.get("observation_mode", "image") != "image":
+            raise ValueError(
+                "SharedMemoryDungeonMazeEnv only shares the image observation, "
+                f"not observation_mode={env_kwargs['observation_mode']!r}"
+            )
+        if env_kwargs.get("corridor_view_depth") is not None:
+            raise ValueError(
+                "SharedMemoryDungeonMazeEnv does not share the corridor view, "
+                "so corridor_view_depth must not be given"
+            )
+        self.num_envs = num_envs
+        self.grid_size = grid_size
+        self.render_mode = None
+        self.metadata = {"render_modes": [], "autoreset_mode": autoreset_mode}
+
+        env = DungeonMazeEnv(grid_size=grid_size, **env_kwargs)
+        self.single_action_space = env.action_space
+        self.single_observation_space = env.observation_space
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        _, memory_size = _shared_array_layout(num_envs)
+        self._memory = SharedMemory(create=True, size=memory_size)
+        self._arrays = _shared_arrays(self._memory.buf, num_envs)
+
+        if num_workers is None:
+            num_workers = min(num_envs, os.cpu_count() or 1)
+        cpus = None
+        if pin_workers and hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+
+        ctx = multiprocessing.get_context(context)
+        self._connections = []
+        self._workers = []
+        env_kwargs = dict(env_kwargs, grid_size=grid_size)
+        for worker_index, env_indices in enumerate(
+            np.array_split(np.arange(num_envs), num_workers)
+        ):
+            connection, worker_connection = ctx.Pipe()
+            worker = ctx.Process(
+                target=_worker,
+                args=(
+                    worker_connection,
+                    self._memory.name,
+                    num_envs,
+                    env_indices.tolist(),
+                    env_kwargs,
+                    autoreset_mode,
+                    None if cpus is None else cpus[worker_index % len(cpus)],
+                ),
+                daemon=True,
+            )
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def _send_command(self, command):
+        """
+        Sends a command to every worker and waits for them all to carry it out.
+        """
+        message = np.array([command], dtype=np.int32).tobytes()
+        for connection in self._connections:
+            connection.send_bytes(message)
+        errors = [connection.recv_bytes() for connection in self._connections]
+        errors = [error.decode() for error in errors if error]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def get_observations(self):
+        """
+        Returns a dictionary containing copies of the stacked robot positions, directions
+        and camera views and the target positions.
+        """
+        return {key: self._arrays[key].copy() for key in OBSERVATION_KEYS}
+
+    def reset(self, seed=None, options=None):
+        """
+        Initialises the sub-environments for a new episode, every one of them or those
+        selected by `options["reset_mask"]`.
+
+        `seed` may be a single integer, in which case sub-environment i is seeded with
+        `seed + i`, or a list with one seed (or None) per sub-environment.
+        """
+        if seed is None:
+            seed = [None] * self.num_envs
+        elif isinstance(seed, (int, np.integer)):
+            seed = [int(seed) + i for i in range(self.num_envs)]
+        assert len(seed) == self.num_envs
+        self._arrays["seed"][:] = [-1 if s is None else s for s in seed]
+
+        if options is not None and "reset_mask" in options:
+            self._arrays["reset_mask"][:] = options["reset_mask"]
+        else:
+            self._arrays["reset_mask"][:] = True
+        self._send_command(RESET)
+
+        return self.get_observations(), {}
+
+    def step(self, actions):
+        """
+        Performs one step of every sub-environment with the given vector of actions.
+        Returning the new stacked states, rewards and whether each episode has terminated.
+        """
+        self._arrays["action"][:] = actions
+        self._send_command(STEP)
+        return (
+            self.get_observations(),
+            self._arrays["reward"].copy(),
+            self._arrays["terminated"].copy(),
+            self._arrays["truncated"].copy(),
+            {},
+        )
+
+    def close_extras(self, **kwargs):
+        """
+        Stops the workers and frees the shared memory.
+        """
+        if self._memory is None:
+            return
+        for connection in self._connections:
+            try:
+                connection.send_bytes(np.array([CLOSE], dtype=np.int32).tobytes())
+                connection.recv_bytes()
+            except (BrokenPipeError, EOFError):
+                pass
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._arrays = None
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
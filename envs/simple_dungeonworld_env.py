@@ -2,15 +2,47 @@
 Simple HeroBot and the MazeDungeon Environment.
 """
 
+import copy
+import os
+import time
 from enum import IntEnum
 
 import numpy as np
-import pygame
 
 import gymnasium as gym
 from gymnasium import spaces
 
-from core.dungeonworld_grid import MazeGrid
+from core.dungeonworld_corpus import MazeCorpus
+from core.dungeonworld_features import (
+    EMBEDDING_SIZE,
+    OBSERVATION_MODES,
+    get_embedding_table,
+)
+from core.dungeonworld_grid import DIRECTION_DELTAS, MAZE_ALGORITHMS, MazeGrid
+from core.dungeonworld_oracle import get_maze_oracle
+from core.dungeonworld_render import (
+    ROBOT_TRIANGLES,
+    draw_cell_gridlines,
+    draw_minimap,
+    draw_robot,
+    render_minimap,
+    render_static_layer,
+    viewport_origin,
+)
+from core.dungeonworld_sight import OCCLUDED, CorridorSight
+from core.dungeonworld_sprites import NUM_SPRITES, instrument_sprite_loads
+from core.dungeonworld_stats import EnvStats
+
+
+def _import_pygame():
+    """
+    Imports pygame the first time something is drawn with it, without its banner,
+    so the environment can be imported and stepped without loading pygame.
+    """
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+
+    return pygame
 
 
 class Actions(IntEnum):
@@ -21,6 +53,12 @@ class Actions(IntEnum):
     move_forwards = 2
 
 
+# The actions as plain ints, which compare faster than enum members
+TURN_RIGHT = int(Actions.turn_right)
+TURN_LEFT = int(Actions.turn_left)
+MOVE_FORWARDS = int(Actions.move_forwards)
+
+
 class Directions(IntEnum):
     # Enumeration of cardinal directions the robot can face
     # taking north as top of maze
@@ -37,11 +75,105 @@ class DungeonMazeEnv(gym.Env):
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
 
-    def __init__(self, render_mode=None, grid_size=16):
+    # Backends that can draw the frames, see `__init__`
+    render_backends = ("pygame", "numpy")
+
+    def __init__(
+        self,
+        render_mode=None,
+        grid_size=16,
+        camera_view_buffer=None,
+        maze_corpus=None,
+        oracle_info=False,
+        render_backend="pygame",
+        instrument=False,
+        maze_algorithm="dfs",
+        viewport_size=None,
+        minimap_size=None,
+        creature_counts=None,
+        corridor_view_depth=None,
+        corridor_view="images",
+        observation_mode="image",
+    ):
         """
         Initialises the simulation environment with the given grid size.
+
+        By default the camera view in the observations is a shared read-only image.
+        If a preallocated (20, 20) uint8 `camera_view_buffer` is given, the camera view
+        is instead written into that buffer on every reset and step.
+
+        If a `maze_corpus` (a `MazeCorpus` or the path of a corpus file) is given, mazes
+        are drawn from the corpus on reset rather than generated.
+
+        If `oracle_info` is True, the info dictionary returned by reset and step includes
+        the "optimal_action" and "distance_to_target" of the robot's state.
+
+        `render_backend` selects how frames are drawn, either "pygame" or "numpy". The
+        NumPy backend does not need pygame for "rgb_array" rendering. Either way the
+        walls, target and gridlines are drawn once per maze and only the robot per frame.
+
+        If `viewport_size` is given, frames show only the square of that many cells across
+        centred on the robot (kept inside the grid), so the cost of a frame does not depend
+        on the grid size. If `minimap_size` is given, an overview of the whole maze at most
+        that many pixels across is drawn in the top left corner of each frame. Viewport and
+        minimap frames are always drawn with the NumPy rasterizer.
+
+        If `creature_counts` is given, e.g. {"orc": 2, "lizard": 1}, that many creatures of
+        each type are placed in empty cells of every maze on reset
+        (see `MazeGrid.populate_creatures`).
+
+        If `corridor_view_depth` is given, the observations also include the
+        "robot_corridor_view" of that many cells along the robot's direction, up to and
+        including the first cell holding an object, with the cells behind it occluded
+        (see `CorridorSight`). `corridor_view` selects whether it holds their camera
+        views as a (depth, 20, 20) uint8 image stack ("images") or their object types
+        as a (depth,) uint8 vector with `OCCLUDED` for hidden cells ("cells").
+
+        `observation_mode` selects how the camera view is observed. "image" gives the
+        20x20 image as "robot_camera_view". "sprite_id" instead gives the object type
+        index and image id of the cell in front of the robot as "robot_camera_view_id",
+        and "embedding" gives the 25 value embedding of the image (see
+        `embed_camera_views`) as "robot_camera_view_embedding". Both are converted back
+        to the image by `to_image_observation`.
+
+        `maze_algorithm` is the `generate_maze` algorithm used to generate mazes on reset.
+        "eller" generates mazes row by row and suits very large grid sizes.
+
+        If `instrument` is True, the time spent in each phase of reset, step and render,
+        and counts of steps, resets and wall bumps, are recorded. See `stats`. The
+        "collision_check" phase is only timed on move forwards steps, the only ones that
+        check the cell in front of the robot.
         """
+        if isinstance(maze_corpus, str):
+            maze_corpus = MazeCorpus(maze_corpus)
+        if maze_corpus is not None:
+            assert maze_corpus.size == grid_size, (
+                f"Maze corpus has grid size {maze_corpus.size}, not {grid_size}"
+            )
+        self.maze_corpus = maze_corpus
+        assert maze_algorithm in MAZE_ALGORITHMS
+        self.maze_algorithm = maze_algorithm
+        self.creature_counts = creature_counts
+        self.maze = None
+        self.maze_index = None
+        self.oracle_info = oracle_info
+        # Shortest path oracle of the current maze, and the maze version it was made for
+        self._maze_oracle = None
+        self._maze_oracle_version = None
+        self._stats = EnvStats() if instrument else None
+        if instrument:
+            instrument_sprite_loads()
+
         self.grid_size = grid_size
+        if camera_view_buffer is not None:
+            assert camera_view_buffer.shape == (20, 20)
+            assert camera_view_buffer.dtype == np.uint8
+        self.camera_view_buffer = camera_view_buffer
+        assert corridor_view in ("images", "cells")
+        self.corridor_view_depth = corridor_view_depth
+        self.corridor_view = corridor_view
+        assert observation_mode in OBSERVATION_MODES
+        self.observation_mode = observation_mode
         self.window_size = 512
 
         # We have 3 actions, corresponding to "turn right", "turn left", "move forwards"
@@ -57,14 +189,62 @@ class DungeonMazeEnv(gym.Env):
                 "robot_position": spaces.Box(0, grid_size - 1, shape=(2,), dtype=int),
                 "robot_direction": spaces.Discrete(len(Directions)),
                 "robot_camera_view": spaces.Box(
-                    low=0, high=255, shape=(20, 20), dtype=np.int32
+                    low=0, high=255, shape=(20, 20), dtype=np.uint8
                 ),
                 "target_position": spaces.Box(0, grid_size - 1, shape=(2,), dtype=int),
             }
         )
+        if corridor_view_depth is not None:
+            if corridor_view == "images":
+                corridor_view_space = spaces.Box(
+                    low=0, high=255, shape=(corridor_view_depth, 20, 20), dtype=np.uint8
+                )
+            else:
+                corridor_view_space = spaces.Box(
+                    low=0, high=OCCLUDED, shape=(corridor_view_depth,), dtype=np.uint8
+                )
+            self.observation_space["robot_corridor_view"] = corridor_view_space
+        if observation_mode != "image":
+            del self.observation_space.spaces["robot_camera_view"]
+        if observation_mode == "sprite_id":
+            self.observation_space["robot_camera_view_id"] = spaces.MultiDiscrete(
+                [len(MazeGrid.OBJECT_TO_IDX), NUM_SPRITES], dtype=np.uint8
+            )
+        elif observation_mode == "embedding":
+            self.observation_space["robot_camera_view_embedding"] = spaces.Box(
+                low=0, high=255, shape=(EMBEDDING_SIZE,), dtype=np.uint8
+            )
+
+        # Line of sight tables of the current maze, and the version of the maze they
+        # were made for
+        self._corridor_sight = None
+        self._corridor_sight_version = None
 
         assert render_mode is None or render_mode in self.metadata["render_modes"]
         self.render_mode = render_mode
+        assert render_backend in self.render_backends
+        self.render_backend = render_backend
+        self.viewport_size = viewport_size
+        self.minimap_size = minimap_size
+        self._numpy_frames = (
+            render_backend == "numpy"
+            or viewport_size is not None
+            or minimap_size is not None
+        )
+
+        # Cached drawing of the parts of the maze that do not change,
+        # and the version of the maze it was drawn for
+        self._static_layer = None
+        self._static_layer_version = None
+
+        # Cached drawing of the viewport, and the version of the maze and the origin it
+        # was drawn for
+        self._viewport_layer = None
+        self._viewport_layer_key = None
+
+        # Cached minimap, and the version of the maze it was drawn for
+        self._minimap = None
+        self._minimap_version = None
 
         # If human-rendering is used, `self.window` will be a reference
         # to the window that we draw to. `self.clock` will be a clock that is used
@@ -77,33 +257,35 @@ class DungeonMazeEnv(gym.Env):
 
     def get_observations(self):
         """
-        Returns a dictionary containing the robot's position, direction and camera view
-        and the target position.
+        Returns a dictionary containing the robot's position, direction and camera view,
+        encoded as selected by `observation_mode`, and the target position.
         """
-        return {
+        observation = {
             "robot_position": self.robot_position,
             "robot_direction": self.robot_direction,
-            "robot_camera_view": self.robot_camera_view,
-            "target_position": self.target_position,
         }
+        if self.observation_mode == "image":
+            observation["robot_camera_view"] = self.robot_camera_view
+        else:
+            object_type, image_id = view_id = self.get_robot_camera_view_id()
+            if self.observation_mode == "sprite_id":
+                observation["robot_camera_view_id"] = view_id
+            else:
+                observation["robot_camera_view_embedding"] = get_embedding_table()[
+                    object_type, image_id
+                ]
+        observation["target_position"] = self.target_position
+        if self.corridor_view_depth is not None:
+            observation["robot_corridor_view"] = self.robot_corridor_view
+        return observation
 
     def get_robot_direction_vector(self):
         """
         Get the direction vector for the robot, pointing in the direction
         of forward movement.
         """
-        direction_vectors = [
-            # Up (negative Y)
-            np.array((0, -1)),
-            # Pointing right (positive X)
-            np.array((1, 0)),
-            # Down (positive Y)
-            np.array((0, 1)),
-            # Pointing left (negative X)
-            np.array((-1, 0)),
-        ]
         assert self.robot_direction >= 0 and self.robot_direction < 4
-        return direction_vectors[self.robot_direction]
+        return np.array(DIRECTION_DELTAS[self.robot_direction])
 
     def get_robot_front_pos(self):
         """
@@ -111,34 +293,198 @@ class DungeonMazeEnv(gym.Env):
         """
         return self.robot_position + self.get_robot_direction_vector()
 
-    def get_robot_camera_view(self):
+    def get_robot_camera_view(self, out=None):
         """
         Returns the 'camera view' for the robot i.e. the image the object in the cell
         in front of the robot. If the cell is empty, then returns a white image.
+
+        The returned image is shared and read-only unless `out` is given, in which case
+        the image is copied into `out` and `out` is returned.
         """
         # Get the position in front of the robot
-        position_in_front = self.get_robot_front_pos()
+        x, y = self.robot_position.tolist()
+        dx, dy = DIRECTION_DELTAS[self.robot_direction]
 
-        # Get the contents of the cell in front of the agent
-        cell_in_front = self.maze.get_cell_item(*position_in_front)
+        # Get the view of the contents of the cell in front of the agent,
+        # a white image if it is empty
+        camera_view = self.maze.get_camera_view(x + dx, y + dy)
 
-        if cell_in_front is None:
-            # if nothing in front return a white image
-            return np.ones((20, 20)) * 255
-        else:
-            return cell_in_front.get_camera_view()
+        if out is None:
+            return camera_view
+        np.copyto(out, camera_view)
+        return out
+
+    def get_robot_camera_view_id(self):
+        """
+        Returns the object type index and image id (0 for objects other than creatures)
+        of the cell in front of the robot, as a (2,) uint8 array.
+        """
+        x, y = self.robot_position.tolist()
+        dx, dy = DIRECTION_DELTAS[self.robot_direction]
+        front = (x + dx, y + dy)
+        return np.array(
+            (self.maze.cells.item(front), self.maze.creatures.get(front, 0)),
+            dtype=np.uint8,
+        )
+
+    def get_robot_corridor_view(self):
+        """
+        Returns the corridor view of the cells in front of the robot (see `__init__`),
+        gathered from line of sight tables computed once per maze.
+        """
+        if self._corridor_sight_version != self.maze.version:
+            self._corridor_sight = CorridorSight(self.maze, self.corridor_view_depth)
+            self._corridor_sight_version = self.maze.version
+        x, y = self.robot_position.tolist()
+        if self.corridor_view == "images":
+            return self._corridor_sight.get_camera_views(x, y, self.robot_direction)
+        return self._corridor_sight.get_cell_types(x, y, self.robot_direction)
+
+    def stats(self):
+        """
+        Returns the recorded timings and counters, as described in `EnvStats.snapshot`,
+        or None if the environment is not instrumented. Snapshots of many environments
+        can be combined with `aggregate_stats`. The sprite atlas is shared by the whole
+        process, so its load time and sprite load counts are returned separately by
+        `atlas_stats` in `core/dungeonworld_sprites.py`.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    def reset_stats(self):
+        """
+        Clears the recorded timings and counters.
+        """
+        if self._stats is not None:
+            self._stats.clear()
+
+    def get_state(self):
+        """
+        Returns a snapshot of the mutable state of the environment: the robot's position
+        and direction, the state of the random number generator and a copy of the maze.
+        The maze layout is shared with the environment rather than copied, so taking a
+        snapshot takes the same time for any grid size.
+        """
+        return {
+            "maze": self.maze.copy(),
+            "maze_index": self.maze_index,
+            "robot_position": self.robot_position.copy(),
+            "robot_direction": self.robot_direction,
+            "target_position": self.target_position.copy(),
+            "rng_state": self.np_random.bit_generator.state,
+        }
+
+    def set_state(self, state):
+        """
+        Restores a snapshot returned by `get_state`. A snapshot can be restored any
+        number of times and into any environment with the same grid size.
+        """
+        assert state["maze"].width == self.grid_size
+        self.maze = state["maze"].copy()
+        self.maze_index = state["maze_index"]
+        self.robot_position = state["robot_position"].copy()
+        self.robot_direction = state["robot_direction"]
+        self.target_position = state["target_position"].copy()
+        self.np_random.bit_generator.state = state["rng_state"]
+        self.robot_camera_view = self.get_robot_camera_view(out=self.camera_view_buffer)
+        if self.corridor_view_depth is not None:
+            self.robot_corridor_view = self.get_robot_corridor_view()
+
+    def clone(self):
+        """
+        Returns an independent copy of the environment in its current state, e.g. for
+        lookahead planning. The copy does not render to a window or record stats.
+        """
+        env = copy.copy(self)
+        env._np_random = np.random.Generator(type(self.np_random.bit_generator)())
+        if self.camera_view_buffer is not None:
+            env.camera_view_buffer = self.camera_view_buffer.copy()
+        if self.render_mode == "human":
+            env.render_mode = None
+        env.window = None
+        env.clock = None
+        env._stats = None
+        env.set_state(self.get_state())
+        return env
+
+    def get_maze_oracle(self):
+        """
+        Returns the shortest path oracle for the current maze, taken from a process wide
+        cache keyed by the maze contents. It is looked up again only when the maze
+        changes (see `MazeGrid.version`).
+        """
+        if self._maze_oracle is None or self._maze_oracle_version != self.maze.version:
+            self._maze_oracle = get_maze_oracle(self.maze, self.target_position)
+            self._maze_oracle_version = self.maze.version
+        return self._maze_oracle
+
+    def optimal_action(self):
+        """
+        Returns an action on a shortest path from the robot's state to the target,
+        or -1 if the robot is at the target.
+        """
+        return self.get_maze_oracle().get_optimal_action(
+            *self.robot_position, self.robot_direction
+        )
+
+    def distance_to_target(self):
+        """
+        Returns the fewest actions the robot needs to reach the target.
+        """
+        return self.get_maze_oracle().get_distance(
+            *self.robot_position, self.robot_direction
+        )
+
+    def _get_oracle_info(self):
+        """
+        Returns the oracle entries of the info dictionary, if enabled.
+        """
+        if not self.oracle_info:
+            return {}
+        return {
+            "optimal_action": self.optimal_action(),
+            "distance_to_target": self.distance_to_target(),
+        }
 
     def reset(self, seed=None, options=None):
         """
         Initialises the environment for a new episode with a randomly generated maze.
         Robot is always initialised at position [1,1] facing south.
         Target is always initialised at [-2,-2].
+
+        If the environment has a maze corpus, the maze is instead drawn from the corpus,
+        either the maze at `options["maze_index"]` or one chosen at random. The index of
+        the maze is returned in the info dictionary as "maze_index".
         """
+        stats = self._stats
+        if stats is not None:
+            reset_start = time.perf_counter()
+
         # We need the following line to seed self.np_random
         super().reset(seed=seed)
 
-        # Create the grid capturing the maze as walls
-        self.maze = MazeGrid(size=self.grid_size, empty=False, np_rng=self.np_random)
+        info = {}
+        if self.maze_corpus is None:
+            # Create the grid capturing the maze as walls
+            self.maze = MazeGrid(
+                size=self.grid_size,
+                empty=False,
+                np_rng=self.np_random,
+                stats=stats,
+                algorithm=self.maze_algorithm,
+            )
+        else:
+            # Take the maze from the corpus
+            if options is not None and "maze_index" in options:
+                self.maze_index = int(options["maze_index"])
+            else:
+                self.maze_index = int(self.np_random.integers(len(self.maze_corpus)))
+            self.maze = self.maze_corpus.get_maze(self.maze_index)
+            info["maze_index"] = self.maze_index
+        if self.creature_counts:
+            self.maze.populate_creatures(self.creature_counts, np_rng=self.np_random)
+        self._maze_oracle = None
 
         # Set the target location
         self.target_position = np.array([self.grid_size - 2, self.grid_size - 2])
@@ -146,75 +492,192 @@ class DungeonMazeEnv(gym.Env):
         # Set the robot's location, direction, inital camera view
         self.robot_position = np.array([1, 1])
         self.robot_direction = Directions.south
-        self.robot_camera_view = self.get_robot_camera_view()
+        if stats is not None:
+            start = time.perf_counter()
+        self.robot_camera_view = self.get_robot_camera_view(out=self.camera_view_buffer)
+        if self.corridor_view_depth is not None:
+            self.robot_corridor_view = self.get_robot_corridor_view()
+        if stats is not None:
+            stats.add_time("camera_view", time.perf_counter() - start)
 
         # Update the observations
         observation = self.get_observations()
+        info.update(self._get_oracle_info())
 
         if self.render_mode == "human":
-            self._render_frame()
+            self._timed_render_frame()
+
+        if stats is not None:
+            stats.add_time("reset", time.perf_counter() - reset_start)
+            stats.count("resets")
 
-        return observation, {}
+        return observation, info
 
     def step(self, action):
         """
         Performs one step of the simulation with the given action.
         Returning the new state, reward and whether the episode has terminated.
         """
-        reward = -1
-        terminated = False
+        stats = self._stats
+        if stats is not None:
+            step_start = time.perf_counter()
 
-        # Get the position in front of the robot
-        position_in_front = self.get_robot_front_pos()
+        reward = -1
+        maze = self.maze
 
-        # Get the contents of the cell in front of the agent
-        cell_in_front = self.maze.get_cell_item(*position_in_front)
+        # The robot's state as Python ints, so no NumPy temporaries are made
+        x, y = self.robot_position.tolist()
+        direction = self.robot_direction
 
         # Attempt actions
-        if action == Actions.turn_left:
-            self.robot_direction -= 1
-            if self.robot_direction < 0:
-                self.robot_direction += 4
-        elif action == Actions.turn_right:
-            self.robot_direction += 1
-            if self.robot_direction > 3:
-                self.robot_direction -= 4
-        elif action == Actions.move_forwards:
-            if cell_in_front is None or cell_in_front.can_overlap():
-                self.robot_position = position_in_front
+        if action == TURN_LEFT:
+            direction -= 1
+            if direction < 0:
+                direction += 4
+            self.robot_direction = direction
+        elif action == TURN_RIGHT:
+            direction += 1
+            if direction > 3:
+                direction -= 4
+            self.robot_direction = direction
+        elif action == MOVE_FORWARDS:
+            # Get the position in front of the robot and check its contents
+            if stats is not None:
+                start = time.perf_counter()
+            dx, dy = DIRECTION_DELTAS[direction]
+            front_x, front_y = x + dx, y + dy
+            can_overlap = maze.can_overlap(front_x, front_y)
+            if stats is not None:
+                stats.add_time("collision_check", time.perf_counter() - start)
+            if can_overlap:
+                x, y = front_x, front_y
+                self.robot_position = np.array((x, y))
             else:
                 # Zero reward as robot tried to crash into an object in the cell in front.
                 reward = 0
+                if stats is not None:
+                    stats.count("wall_bumps")
         else:
             assert False, "unknown action"
 
         # Update the robot's camera view
-        self.robot_camera_view = self.get_robot_camera_view()
+        if stats is not None:
+            start = time.perf_counter()
+        dx, dy = DIRECTION_DELTAS[direction]
+        camera_view = maze.get_camera_view(x + dx, y + dy)
+        if self.camera_view_buffer is not None:
+            np.copyto(self.camera_view_buffer, camera_view)
+            camera_view = self.camera_view_buffer
+        self.robot_camera_view = camera_view
+        if self.corridor_view_depth is not None:
+            self.robot_corridor_view = self.get_robot_corridor_view()
+        if stats is not None:
+            stats.add_time("camera_view", time.perf_counter() - start)
 
         # Update the observations
         observation = self.get_observations()
 
         # An episode is terminated if the agent has reached the target
-        if np.array_equal(self.robot_position, self.target_position):
-            terminated = True
+        target_x, target_y = self.target_position.tolist()
+        terminated = x == target_x and y == target_y
 
         if self.render_mode == "human":
-            self._render_frame()
+            self._timed_render_frame()
+
+        info = self._get_oracle_info() if self.oracle_info else {}
+        if stats is not None:
+            stats.add_time("step", time.perf_counter() - step_start)
+            stats.count("steps")
 
-        return observation, reward, terminated, False, {}
+        return observation, reward, terminated, False, info
 
     def render(self):
         if self.render_mode == "rgb_array":
+            return self._timed_render_frame()
+
+    def _timed_render_frame(self):
+        """
+        Renders a frame, recording the time taken if the environment is instrumented.
+        """
+        if self._stats is None:
             return self._render_frame()
+        start = time.perf_counter()
+        frame = self._render_frame()
+        self._stats.add_time("render", time.perf_counter() - start)
+        return frame
 
-    def _render_frame(self):
-        if self.window is None and self.render_mode == "human":
-            pygame.init()
-            pygame.display.init()
-            self.window = pygame.display.set_mode((self.window_size, self.window_size))
-        if self.clock is None and self.render_mode == "human":
-            self.clock = pygame.time.Clock()
+    def _get_static_layer(self):
+        """
+        Returns the target, walls and gridlines of the current maze, which do not change
+        during an episode. They are drawn once per maze, as a pygame surface or a NumPy
+        frame depending on the render backend.
+        """
+        if self._static_layer_version != self.maze.version:
+            if self._numpy_frames:
+                self._static_layer = render_static_layer(
+                    self.maze.cells, self.target_position, self.window_size
+                )
+            else:
+                self._static_layer = self._draw_static_surface()
+            self._static_layer_version = self.maze.version
+        return self._static_layer
 
+    def _get_viewport_layer(self, origin):
+        """
+        Returns the target, walls and gridlines of the viewport with its top left corner
+        at the cell `origin`, redrawn only when the viewport moves.
+        """
+        key = (self.maze.version, tuple(origin))
+        if self._viewport_layer_key != key:
+            (left, top), viewport_size = origin, min(self.viewport_size, self.grid_size)
+            self._viewport_layer = render_static_layer(
+                self.maze.cells[left : left + viewport_size, top : top + viewport_size],
+                self.target_position - origin,
+                self.window_size,
+            )
+            self._viewport_layer_key = key
+        return self._viewport_layer
+
+    def _get_minimap(self):
+        """
+        Returns the minimap of the current maze, drawn once per maze.
+        """
+        if self._minimap_version != self.maze.version:
+            self._minimap = render_minimap(self.maze.cells, self.minimap_size)
+            self._minimap_version = self.maze.version
+        return self._minimap
+
+    def _draw_frame(self):
+        """
+        Draws the current frame as a NumPy array, showing the viewport around the robot
+        and the minimap if they are enabled.
+        """
+        if self.viewport_size is None:
+            frame = self._get_static_layer().copy()
+            origin = np.zeros(2, dtype=int)
+            viewport_size = self.grid_size
+        else:
+            viewport_size = min(self.viewport_size, self.grid_size)
+            origin = viewport_origin(self.robot_position, viewport_size, self.grid_size)
+            frame = self._get_viewport_layer(origin).copy()
+
+        # The size of a single grid square in pixels
+        pix_square_size = self.window_size / viewport_size
+        robot_position = self.robot_position - origin
+        draw_robot(frame, robot_position, self.robot_direction, pix_square_size)
+        draw_cell_gridlines(frame, robot_position, pix_square_size)
+
+        if self.minimap_size is not None:
+            draw_minimap(
+                frame, self._get_minimap(), self.grid_size, self.robot_position
+            )
+        return frame
+
+    def _draw_static_surface(self):
+        """
+        Draws the target, walls and gridlines of the current maze with pygame.
+        """
+        pygame = _import_pygame()
         canvas = pygame.Surface((self.window_size, self.window_size))
         canvas.fill((255, 255, 255))
         pix_square_size = (
@@ -232,56 +695,14 @@ class DungeonMazeEnv(gym.Env):
         )
 
         # Draw the walls
-        for cell in self.maze.grid:
-            if cell is not None and cell.type == "wall":
-                pygame.draw.rect(
-                    canvas,
-                    (0, 0, 0),
-                    pygame.Rect(
-                        pix_square_size * cell.pos,
-                        (pix_square_size, pix_square_size),
-                    ),
-                )
-
-        # Now we draw the robot with direction it's facing
-        if self.robot_direction == Directions.north:
-            pygame.draw.polygon(
+        wall_positions = np.argwhere(self.maze.cells == MazeGrid.OBJECT_TO_IDX["wall"])
+        for wall_position in wall_positions:
+            pygame.draw.rect(
                 canvas,
-                (0, 0, 255),
-                (
-                    (self.robot_position + np.array([0.1, 0.9])) * pix_square_size,
-                    (self.robot_position + np.array([0.9, 0.9])) * pix_square_size,
-                    (self.robot_position + np.array([0.5, 0.1])) * pix_square_size,
-                ),
-            )
-        elif self.robot_direction == Directions.east:
-            pygame.draw.polygon(
-                canvas,
-                (0, 0, 255),
-                (
-                    (self.robot_position + np.array([0.1, 0.9])) * pix_square_size,
-                    (self.robot_position + np.array([0.1, 0.1])) * pix_square_size,
-                    (self.robot_position + np.array([0.9, 0.5])) * pix_square_size,
-                ),
-            )
-        elif self.robot_direction == Directions.south:
-            pygame.draw.polygon(
-                canvas,
-                (0, 0, 255),
-                (
-                    (self.robot_position + np.array([0.9, 0.1])) * pix_square_size,
-                    (self.robot_position + np.array([0.1, 0.1])) * pix_square_size,
-                    (self.robot_position + np.array([0.5, 0.9])) * pix_square_size,
-                ),
-            )
-        elif self.robot_direction == Directions.west:
-            pygame.draw.polygon(
-                canvas,
-                (0, 0, 255),
-                (
-                    (self.robot_position + np.array([0.9, 0.1])) * pix_square_size,
-                    (self.robot_position + np.array([0.9, 0.9])) * pix_square_size,
-                    (self.robot_position + np.array([0.1, 0.5])) * pix_square_size,
+                (0, 0, 0),
+                pygame.Rect(
+                    pix_square_size * wall_position,
+                    (pix_square_size, pix_square_size),
                 ),
             )
 
@@ -302,6 +723,46 @@ class DungeonMazeEnv(gym.Env):
                 width=3,
             )
 
+        return canvas
+
+    def _render_frame(self):
+        if self.render_mode == "human" or not self._numpy_frames:
+            pygame = _import_pygame()
+        if self.window is None and self.render_mode == "human":
+            pygame.init()
+            pygame.display.init()
+            self.window = pygame.display.set_mode((self.window_size, self.window_size))
+        if self.clock is None and self.render_mode == "human":
+            self.clock = pygame.time.Clock()
+
+        pix_square_size = (
+            self.window_size / self.grid_size
+        )  # The size of a single grid square in pixels
+
+        if self._numpy_frames:
+            # Copy the cached maze and draw the robot on top
+            frame = self._draw_frame()
+            if self.render_mode != "human":
+                return frame
+            canvas = pygame.surfarray.make_surface(np.transpose(frame, axes=(1, 0, 2)))
+        else:
+            # Copy the cached maze and draw the robot with direction it's facing
+            canvas = self._get_static_layer().copy()
+            pygame.draw.polygon(
+                canvas,
+                (0, 0, 255),
+                (self.robot_position + ROBOT_TRIANGLES[self.robot_direction])
+                * pix_square_size,
+            )
+
+            # Gridlines go on top, so redraw the ones around the robot's grid square
+            left, top = pix_square_size * self.robot_position
+            right, bottom = pix_square_size * (self.robot_position + 1)
+            for y in (top, bottom):
+                pygame.draw.line(canvas, 0, (left, y), (right, y), width=3)
+            for x in (left, right):
+                pygame.draw.line(canvas, 0, (x, top), (x, bottom), width=3)
+
         if self.render_mode == "human":
             # The following line copies our drawings from `canvas` to the visible window
             self.window.blit(canvas, canvas.get_rect())
@@ -319,5 +780,6 @@ class DungeonMazeEnv(gym.Env):
 
     def close(self):
         if self.window is not None:
+            pygame = _import_pygame()
             pygame.display.quit()
             pygame.quit()
@@ -0,0 +1,83 @@
+"""
+Wrapper recording the episodes of a MazeDungeon environment to a compact log.
+"""
+
+import gymnasium as gym
+
+from core.dungeonworld_grid import DIRECTION_VECTORS
+from core.dungeonworld_trajectories import (
+    DEFAULT_CHUNK_SIZE,
+    RESET_ACTION,
+    TrajectoryWriter,
+)
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Streams every reset and step of a `DungeonMazeEnv` to a trajectory log directory
+    at `path` (see `core/dungeonworld_trajectories.py`), as columns of actions, rewards,
+    robot positions and directions, and the type and image id of the object in front
+    of the robot in place of the camera view.
+
+    Episodes played in a maze corpus store the maze index, others store the maze itself
+    with the image ids of its creatures. Episodes in a corpus maze with creatures added
+    store both.
+    Load the log with `TrajectoryDataset` to rebuild the observations.
+    """
+
+    def __init__(self, env, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(env)
+        self.writer = TrajectoryWriter(path, chunk_size=chunk_size)
+
+    def _get_view_ids(self, observation):
+        """
+        Returns the object type and image id of the cell in front of the robot.
+        """
+        maze = self.env.unwrapped.maze
+        x, y = (
+            observation["robot_position"]
+            + DIRECTION_VECTORS[observation["robot_direction"]]
+        )
+        x, y = int(x), int(y)
+        return maze.cells[x, y], maze.creatures.get((x, y), 0)
+
+    def reset(self, seed=None, options=None):
+        observation, info = self.env.reset(seed=seed, options=options)
+        env = self.env.unwrapped
+        maze_index = maze_cells = maze_sprites = None
+        if env.maze_corpus is not None:
+            maze_index = env.maze_index
+        if env.maze_corpus is None or env.maze.creatures:
+            maze_cells = env.maze.cells
+            maze_sprites = env.maze.encode_sprites_to_array()
+        self.writer.start_episode(
+            observation["target_position"],
+            maze_index=maze_index,
+            maze_cells=maze_cells,
+            maze_sprites=maze_sprites,
+        )
+        self.writer.add_record(
+            RESET_ACTION,
+            0,
+            observation["robot_position"],
+            observation["robot_direction"],
+            *self._get_view_ids(observation),
+        )
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.add_record(
+            action,
+            reward,
+            observation["robot_position"],
+            observation["robot_direction"],
+            *self._get_view_ids(observation),
+            terminated,
+            truncated,
+        )
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self.writer.close()
+        super().close()
@@ -1,4 +1,6 @@
 from envs.simple_dungeonworld_env import DungeonMazeEnv, Actions, Directions
+from core.dungeonworld_grid import MazeGrid
+from core.dungeonworld_objects import Wall
 import numpy as np
 
 SIZE = 8
@@ -104,3 +106,903 @@ total_reward += reward
 assert np.array_equal(observation["robot_position"], observation["target_position"])
 assert terminated == True
 assert total_reward == -15
+
+# Check the batched env matches separate envs with the same seeds,
+# including the automatic reset after the first env reaches the target
+from envs.batched_dungeonworld_env import BatchedDungeonMazeEnv
+
+NUM_ENVS = 4
+batched_env = BatchedDungeonMazeEnv(NUM_ENVS, grid_size=SIZE)
+single_envs = [DungeonMazeEnv(grid_size=SIZE) for _ in range(NUM_ENVS)]
+batched_observation, _ = batched_env.reset(seed=124)
+single_observations = [e.reset(seed=124 + i)[0] for i, e in enumerate(single_envs)]
+
+rng = np.random.default_rng(0)
+solution = action_sequence + [Actions.turn_left, Actions.move_forwards]
+single_done = [False] * NUM_ENVS
+num_terminations = 0
+for t in range(200):
+    actions = rng.integers(0, 3, size=NUM_ENVS)
+    if t < len(solution):
+        actions[0] = solution[t]
+    batched_observation, rewards, terminations, truncations, _ = batched_env.step(
+        actions
+    )
+    for i, e in enumerate(single_envs):
+        if single_done[i]:
+            single_observation, reward, terminated = e.reset()[0], 0, False
+        else:
+            single_observation, reward, terminated, _, _ = e.step(actions[i])
+        single_done[i] = terminated
+        for key, value in single_observation.items():
+            assert np.array_equal(batched_observation[key][i], value)
+        assert rewards[i] == reward
+        assert terminations[i] == terminated
+    assert batched_observation in batched_env.observation_space
+    num_terminations += terminations.sum()
+assert num_terminations > 0
+
+# NumPy integer seeds seed the sub-environments like Python ones
+batched_env.reset(seed=np.int64(124))
+numpy_seeded_mazes = batched_env.mazes.copy()
+batched_env.reset(seed=124)
+assert np.array_equal(numpy_seeded_mazes, batched_env.mazes)
+
+# Check encoding and decoding a maze round trips and objects are created on request
+env.reset(seed=124)
+encoded_maze = env.maze.encode_maze_to_array()
+assert encoded_maze.dtype == np.uint8
+decoded_maze = MazeGrid.decode_maze_from_array(encoded_maze)
+assert decoded_maze == env.maze
+assert decoded_maze.get_cell_item(0, 0).type == "wall"
+assert decoded_maze.get_cell_item(0, 0) is decoded_maze.get_cell_item(0, 0)
+assert decoded_maze.get_cell_item(1, 1) is None
+assert [cell is None for cell in decoded_maze.grid] == list(encoded_maze.T.ravel() == 0)
+decoded_maze.add_cell_item(1, 1, Wall(pos=np.array([1, 1])))
+assert not decoded_maze == env.maze
+
+# Check creature images are views into the sprite atlas, which matches the PNG images
+from core.dungeonworld_objects import Orc, Wingedbat, Lizard
+from core.dungeonworld_sprites import (
+    SPECIES,
+    build_sprite_atlas,
+    get_sprite_atlas,
+)
+
+sprite_atlas = get_sprite_atlas()
+assert sprite_atlas.shape == (len(SPECIES), 100, 20, 20)
+assert np.array_equal(sprite_atlas, build_sprite_atlas())
+for creature in [
+    Orc(np.array([1, 1]), 7),
+    Wingedbat(np.array([1, 1]), 99),
+    Lizard(np.array([1, 1]), 0),
+]:
+    assert np.shares_memory(creature.image, sprite_atlas)
+    assert not creature.image.flags.writeable
+
+# Check camera views are shared read-only uint8 images, or written into a given buffer
+from core.dungeonworld_objects import EMPTY_VIEW
+
+env.reset(seed=124)
+assert env.robot_camera_view is EMPTY_VIEW
+assert env.robot_camera_view.dtype == np.uint8
+assert not env.robot_camera_view.flags.writeable
+assert env.maze.get_cell_item(0, 0).image is env.maze.get_cell_item(0, 1).image
+
+camera_view_buffer = np.zeros((20, 20), dtype=np.uint8)
+buffered_env = DungeonMazeEnv(grid_size=SIZE, camera_view_buffer=camera_view_buffer)
+observation, info = buffered_env.reset(seed=124)
+assert observation["robot_camera_view"] is camera_view_buffer
+assert np.array_equal(camera_view_buffer, EMPTY_CELL_IMAGE)
+observation, reward, terminated, truncated, info = buffered_env.step(Actions.turn_left)
+assert observation["robot_camera_view"] is camera_view_buffer
+assert np.array_equal(camera_view_buffer, WALL_CELL_IMAGE)
+assert observation in buffered_env.observation_space
+
+# Check bulk maze generation is reproducible per maze and the same serially or in parallel
+from core.dungeonworld_grid import generate_maze, generate_mazes, maze_seed_sequence
+
+mazes = generate_mazes(12, SIZE, seed=5)
+assert mazes.shape == (12, SIZE, SIZE) and mazes.dtype == np.uint8
+assert np.array_equal(mazes, generate_mazes(12, SIZE, seed=5, processes=2))
+assert np.array_equal(
+    mazes[7],
+    generate_maze(
+        SIZE, np.random.default_rng(maze_seed_sequence(5, 7)), algorithm="fast_dfs"
+    ),
+)
+# Both algorithms carve a perfect maze so open the same number of cells
+assert np.all(mazes.sum(axis=(1, 2)) == generate_maze(SIZE, seed=5).sum())
+
+# Check mazes can be drawn from a memory-mapped maze corpus
+import os
+import tempfile
+
+from core.dungeonworld_corpus import MazeCorpus, build_maze_corpus, write_maze_corpus
+
+with tempfile.TemporaryDirectory() as corpus_dir:
+    corpus_path = os.path.join(corpus_dir, "mazes.dmzc")
+    corpus = build_maze_corpus(corpus_path, 20, SIZE, seed=5)
+    assert len(corpus) == 20 and corpus.size == SIZE
+    assert corpus.seed == 5 and corpus.algorithm == "fast_dfs"
+    assert np.array_equal(corpus.get_walls(13), generate_mazes(20, SIZE, seed=5)[13])
+
+    unpacked_path = os.path.join(corpus_dir, "unpacked.dmzc")
+    write_maze_corpus(unpacked_path, generate_mazes(20, SIZE, seed=5), packed=False)
+    unpacked_corpus = MazeCorpus(unpacked_path)
+    assert unpacked_corpus.seed is None and not unpacked_corpus.packed
+    assert unpacked_corpus.get_maze(13) == corpus.get_maze(13)
+
+    corpus_env = DungeonMazeEnv(grid_size=SIZE, maze_corpus=corpus_path)
+    observation, info = corpus_env.reset(seed=1, options={"maze_index": 13})
+    assert info["maze_index"] == 13 and corpus_env.maze == corpus.get_maze(13)
+    assert corpus_env.maze.get_cell_item(SIZE - 2, SIZE - 2).type == "target"
+    assert np.array_equal(observation["robot_position"], np.array([1, 1]))
+    observation, info = corpus_env.reset(seed=1)
+    assert corpus_env.reset(seed=1)[1]["maze_index"] == info["maze_index"]
+    del corpus, unpacked_corpus, corpus_env
+
+# Check the compiled MDP follows the env dynamics and the solvers agree
+from core.dungeonworld_mdp import (
+    compile_maze_mdp,
+    policy_iteration,
+    solve_mazes,
+    value_iteration,
+)
+
+env.reset(seed=124)
+maze_mdp = compile_maze_mdp(env.maze)
+for x, y in np.argwhere(env.maze.cells != MazeGrid.OBJECT_TO_IDX["wall"])[:-1]:
+    for direction in Directions:
+        for action in Actions:
+            env.robot_position, env.robot_direction = np.array([x, y]), direction
+            observation, reward, terminated, truncated, info = env.step(action)
+            state = maze_mdp.state_index(x, y, direction)
+            assert maze_mdp.next_state[state, action] == maze_mdp.state_index(
+                *observation["robot_position"], observation["robot_direction"]
+            )
+            assert maze_mdp.reward[state, action] == reward
+
+# Bumping into a wall is free, so the best the robot can do is face a wall
+start_state = maze_mdp.state_index(1, 1, Directions.south)
+values, policy = value_iteration(maze_mdp)
+assert values[start_state] == -1 and policy[start_state] != Actions.move_forwards
+
+# If bumping into walls costs, the optimal route is the action sequence above
+maze_mdp = compile_maze_mdp(env.maze, bump_reward=-1)
+values, policy = value_iteration(maze_mdp)
+assert values[start_state] == total_reward
+assert np.array_equal(values, policy_iteration(maze_mdp)[0])
+batched_values, batched_policy = solve_mazes([env.maze, env.maze], bump_reward=-1)
+assert np.array_equal(batched_values[1], maze_mdp.to_grid(values)[0])
+
+# Check the oracle's distances match the optimal values and following it reaches the target
+from core.dungeonworld_oracle import MazeOracleCache, get_maze_oracle
+
+oracle_env = DungeonMazeEnv(grid_size=SIZE, oracle_info=True)
+observation, info = oracle_env.reset(seed=124)
+assert info["distance_to_target"] == -total_reward
+oracle = get_maze_oracle(oracle_env.maze)
+reachable = maze_mdp.to_grid(maze_mdp.valid)[0]
+assert np.array_equal(
+    -oracle.distance[reachable], maze_mdp.to_grid(values)[0][reachable]
+)
+assert get_maze_oracle(MazeGrid.decode_maze_from_array(encoded_maze)) is oracle
+# The env passes its target explicitly, which is the default target
+assert oracle_env.get_maze_oracle() is oracle
+
+terminated = False
+while not terminated:
+    distance = oracle_env.distance_to_target()
+    observation, reward, terminated, truncated, info = oracle_env.step(
+        info["optimal_action"]
+    )
+    assert info["distance_to_target"] == distance - 1
+assert info["optimal_action"] == -1
+
+oracle_cache = MazeOracleCache(maxsize=2)
+for seed in [1, 2, 3, 1]:
+    oracle_env.reset(seed=seed)
+    oracle_cache.get(oracle_env.maze)
+assert len(oracle_cache) == 2
+
+# Check the NumPy renderer draws the same frames as pygame, bar the edges of the robot
+pygame_env = DungeonMazeEnv(render_mode="rgb_array", grid_size=SIZE)
+numpy_env = DungeonMazeEnv(
+    render_mode="rgb_array", grid_size=SIZE, render_backend="numpy"
+)
+pygame_env.reset(seed=124)
+numpy_env.reset(seed=124)
+for action in solution:
+    pygame_env.step(action)
+    numpy_env.step(action)
+    pygame_frame, numpy_frame = pygame_env.render(), numpy_env.render()
+    assert numpy_frame.shape == pygame_frame.shape == (512, 512, 3)
+    assert np.any(numpy_frame != pygame_frame, axis=2).sum() < 100
+
+# A wall added to the maze is drawn on the next frame
+for render_env in (pygame_env, numpy_env):
+    render_env.maze.add_cell_item(1, 1, Wall(np.array([1, 1])))
+pygame_wall_frame, numpy_wall_frame = pygame_env.render(), numpy_env.render()
+cell_centre = 512 // SIZE * 3 // 2
+assert np.any(
+    numpy_wall_frame[cell_centre, cell_centre] != numpy_frame[cell_centre, cell_centre]
+)
+assert np.array_equal(
+    numpy_wall_frame[cell_centre, cell_centre],
+    pygame_wall_frame[cell_centre, cell_centre],
+)
+
+# Check the instrumented environment counts and times its phases
+from core.dungeonworld_sprites import atlas_stats, get_sprite
+from core.dungeonworld_stats import aggregate_stats
+
+# Sprite loads are only counted once instrumentation is turned on
+assert "sprite_loads" not in atlas_stats()["counters"]
+stats_envs = [DungeonMazeEnv(grid_size=SIZE, instrument=True) for _ in range(2)]
+for stats_env in stats_envs:
+    stats_env.reset(seed=124)
+    for action in solution:
+        stats_env.step(action)
+    stats = stats_env.stats()
+    assert stats["counters"]["steps"] == len(solution)
+    assert stats["counters"]["resets"] == 1
+    assert stats["phases"]["maze_generation"]["calls"] == 1
+    assert stats["phases"]["camera_view"]["calls"] == len(solution) + 1
+    assert stats["phases"]["step"]["total_time"] > 0
+combined_stats = aggregate_stats(stats_env.stats() for stats_env in stats_envs)
+assert combined_stats["counters"]["steps"] == 2 * len(solution)
+assert combined_stats["phases"]["collision_check"]["calls"] == sum(
+    action == Actions.move_forwards for action in solution
+) * len(stats_envs)
+# The shared sprite atlas is reported once per process, not once per env
+assert "sprite_atlas_load" not in combined_stats["phases"]
+assert atlas_stats()["counters"]["sprite_atlas_loads"] == 1
+sprite_loads = atlas_stats()["counters"].get("sprite_loads", 0)
+get_sprite("orc", 7)
+assert atlas_stats()["counters"]["sprite_loads"] == sprite_loads + 1
+stats_envs[0].reset_stats()
+assert stats_envs[0].stats()["counters"] == {}
+assert DungeonMazeEnv(grid_size=SIZE).stats() is None
+
+# Check snapshots and clones of the environment
+state_env = DungeonMazeEnv(grid_size=SIZE)
+state_env.reset(seed=124)
+for action in solution[:10]:
+    state_env.step(action)
+state = state_env.get_state()
+assert state["maze"].cells is state_env.maze.cells
+clone_env = state_env.clone()
+for action in solution[10:]:
+    observation, reward, terminated, truncated, info = state_env.step(action)
+    clone_observation, clone_reward, clone_terminated, _, _ = clone_env.step(action)
+    assert reward == clone_reward and terminated == clone_terminated
+    for key in observation:
+        assert np.array_equal(observation[key], clone_observation[key])
+assert terminated
+
+state_env.set_state(state)
+assert np.array_equal(state_env.robot_position, state["robot_position"])
+assert not np.array_equal(clone_env.robot_position, state["robot_position"])
+
+# Restoring the random number generator state reproduces the next maze
+state_env.reset()
+next_maze = state_env.maze
+state_env.set_state(state)
+state_env.reset()
+assert state_env.maze == next_maze
+
+# Adding an item to a copy of a maze does not change the original
+maze_copy = next_maze.copy()
+assert maze_copy.version == next_maze.version
+maze_copy.add_cell_item(1, 1, Wall(np.array([1, 1])))
+assert maze_copy.cells is not next_maze.cells
+assert maze_copy.version != next_maze.version
+assert maze_copy.get_cell_item(1, 1).type == "wall"
+assert next_maze.get_cell_item(1, 1) is None
+
+# The env's oracle follows changes made to its maze in place
+state_env.reset(seed=124)
+stale_oracle = state_env.get_maze_oracle()
+state_env.maze.add_cell_item(5, 5, Wall(np.array([5, 5])))
+assert state_env.get_maze_oracle() is not stale_oracle
+assert state_env.get_maze_oracle() is get_maze_oracle(state_env.maze)
+state_env.set_state(state)
+assert state_env.get_maze_oracle() is get_maze_oracle(state["maze"])
+
+# Check episodes replayed from a trajectory log match the environment
+from core.dungeonworld_trajectories import TrajectoryDataset
+from envs.trajectory_recorder import TrajectoryRecorder
+
+with tempfile.TemporaryDirectory() as log_dir:
+    recorder = TrajectoryRecorder(
+        DungeonMazeEnv(grid_size=SIZE), log_dir, chunk_size=16
+    )
+    observations = [recorder.reset(seed=124)[0]]
+    for action in solution:
+        observations.append(recorder.step(action)[0])
+    recorder.reset(seed=1)
+    recorder.close()
+
+    dataset = TrajectoryDataset(log_dir)
+    assert dataset.num_episodes == 2
+    assert len(dataset) == len(solution) + 2
+    records = dataset.get_episode_records(0)
+    assert (
+        dataset.terminated[records][-1]
+        and dataset.reward[records].sum() == total_reward
+    )
+    replayed = dataset.get_observations(records)
+    for i, observation in enumerate(observations):
+        for key in observation:
+            assert np.array_equal(replayed[key][i], observation[key])
+            assert np.array_equal(dataset.get_observation(i)[key], observation[key])
+    assert dataset.get_maze(0) == MazeGrid.decode_maze_from_array(encoded_maze)
+
+# Creatures are recorded with the maze, including those added to corpus mazes
+with tempfile.TemporaryDirectory() as log_dir:
+    corpus_path = os.path.join(log_dir, "mazes.dmzc")
+    build_maze_corpus(corpus_path, 4, SIZE, seed=5)
+    for maze_corpus in (None, corpus_path):
+        episode_dir = os.path.join(
+            log_dir, "generated" if maze_corpus is None else "corpus"
+        )
+        recorder = TrajectoryRecorder(
+            DungeonMazeEnv(
+                grid_size=SIZE,
+                maze_corpus=maze_corpus,
+                creature_counts={"orc": 2, "lizard": 1},
+            ),
+            episode_dir,
+        )
+        recorder.reset(seed=3)
+        recorded_maze = recorder.unwrapped.maze
+        recorder.close()
+        dataset_maze = TrajectoryDataset(episode_dir).get_maze(0)
+        assert dataset_maze == recorded_maze
+        assert dataset_maze.creatures == recorded_maze.creatures
+
+# Check Eller's algorithm streams the same solvable maze into any output
+eller_maze = generate_maze(SIZE, seed=124, algorithm="eller")
+assert np.array_equal(eller_maze, generate_maze(SIZE, seed=124, algorithm="eller"))
+assert np.array_equal(
+    np.unpackbits(
+        generate_maze(SIZE, seed=124, algorithm="eller", packed=True), axis=1
+    )[:, :SIZE],
+    eller_maze,
+)
+with tempfile.TemporaryDirectory() as eller_dir:
+    eller_memmap = np.lib.format.open_memmap(
+        os.path.join(eller_dir, "maze.npy"),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(SIZE, SIZE),
+    )
+    generate_maze(SIZE, seed=124, algorithm="eller", out=eller_memmap)
+    assert np.array_equal(eller_memmap, eller_maze)
+    del eller_memmap
+
+eller_env = DungeonMazeEnv(grid_size=SIZE, maze_algorithm="eller")
+eller_env.reset(seed=124)
+assert np.array_equal(eller_env.maze.cells == 1, eller_maze == 1)
+# A perfect maze has exactly one passage fewer than it has open cells
+open_cells = eller_maze == 0
+passages = (open_cells[1:, :] & open_cells[:-1, :]).sum() + (
+    open_cells[:, 1:] & open_cells[:, :-1]
+).sum()
+assert passages == open_cells.sum() - 1
+assert eller_env.distance_to_target() > 0
+
+# Check viewport frames crop the full frame and the minimap shows the walls
+from core.dungeonworld_render import render_minimap
+
+full_env = DungeonMazeEnv(
+    render_mode="rgb_array", grid_size=SIZE, render_backend="numpy"
+)
+whole_viewport_env = DungeonMazeEnv(
+    render_mode="rgb_array", grid_size=SIZE, viewport_size=SIZE
+)
+viewport_env = DungeonMazeEnv(
+    render_mode="rgb_array", grid_size=SIZE, viewport_size=5, minimap_size=64
+)
+for render_env in [full_env, whole_viewport_env, viewport_env]:
+    render_env.reset(seed=124)
+for action in solution[:20]:
+    for render_env in [full_env, whole_viewport_env, viewport_env]:
+        render_env.step(action)
+    assert np.array_equal(full_env.render(), whole_viewport_env.render())
+    assert viewport_env.render().shape == (512, 512, 3)
+
+# A smaller viewport is the slice of a full frame drawn at the same scale, 128 pixels
+# per cell, around the robot, moved inside the grid near its edges
+from core.dungeonworld_render import viewport_origin
+
+scaled_full_env = DungeonMazeEnv(
+    render_mode="rgb_array", grid_size=SIZE, render_backend="numpy"
+)
+scaled_full_env.window_size = 128 * SIZE
+cropped_env = DungeonMazeEnv(render_mode="rgb_array", grid_size=SIZE, viewport_size=5)
+cropped_env.window_size = 128 * 5
+scaled_full_env.reset(seed=124)
+cropped_env.reset(seed=124)
+clamped_origins = []
+for action in solution:
+    scaled_full_env.step(action)
+    cropped_env.step(action)
+    origin = viewport_origin(cropped_env.robot_position, 5, SIZE)
+    if not np.array_equal(origin, cropped_env.robot_position - 2):
+        clamped_origins.append(tuple(origin.tolist()))
+    left, top = origin * 128
+    assert np.array_equal(
+        cropped_env.render(),
+        scaled_full_env.render()[top : top + 128 * 5, left : left + 128 * 5],
+    )
+# The robot went near the entrance and near the target, where the viewport is clamped
+assert (0, 0) in clamped_origins
+assert any(x == SIZE - 5 or y == SIZE - 5 for x, y in clamped_origins)
+
+# Walls added to the maze are drawn in the viewport and the minimap
+minimap_frame = viewport_env.render()
+for render_env in [scaled_full_env, cropped_env, viewport_env]:
+    render_env.maze.add_cell_item(5, 5, Wall(np.array([5, 5])))
+assert np.array_equal(
+    cropped_env.render(),
+    scaled_full_env.render()[top : top + 128 * 5, left : left + 128 * 5],
+)
+minimap_wall_frame = viewport_env.render()
+scale = 64 // SIZE
+assert np.any(
+    minimap_wall_frame[5 * scale, 5 * scale] != minimap_frame[5 * scale, 5 * scale]
+)
+
+minimap = render_minimap(encoded_maze, 64)
+assert minimap.shape == (64, 64, 3)
+scale = 64 // SIZE
+assert np.array_equal(minimap[::scale, ::scale, 0].T == 0, encoded_maze == 1)
+
+# Check creatures are placed in empty cells, indexed by type and encoded losslessly
+creature_maze = MazeGrid(32, empty=False, np_rng=np.random.default_rng(0))
+empty_cells = creature_maze.cells == MazeGrid.OBJECT_TO_IDX["empty"]
+creature_counts = {"orc": 40, "wingedbat": 20, "lizard": 10}
+creature_positions = creature_maze.populate_creatures(creature_counts, seed=1)
+assert len(creature_positions) == 70
+assert empty_cells[creature_positions[:, 0], creature_positions[:, 1]].all()
+assert creature_maze.get_cell_item(1, 1) is None
+for creature_type, count in creature_counts.items():
+    positions = creature_maze.get_creature_positions(creature_type)
+    assert len(positions) == count
+    assert all(creature_maze.get_cell_item(*p).type == creature_type for p in positions)
+
+lizard = creature_maze.nearest_creature((1, 1), "lizard")
+lizard_distances = np.abs(creature_maze.get_creature_positions("lizard") - 1).sum(
+    axis=1
+)
+assert (
+    lizard.type == "lizard" and np.abs(lizard.pos - 1).sum() == lizard_distances.min()
+)
+assert np.array_equal(
+    lizard.get_camera_view(), sprite_atlas[SPECIES.index("lizard"), lizard.image_id]
+)
+
+decoded_maze = MazeGrid.decode_maze_from_array(
+    creature_maze.encode_maze_to_array(), creature_maze.encode_sprites_to_array()
+)
+assert (
+    decoded_maze == creature_maze and decoded_maze.creatures == creature_maze.creatures
+)
+assert len(decoded_maze.get_creature_positions()) == 70
+
+creature_env = DungeonMazeEnv(grid_size=32, creature_counts=creature_counts)
+creature_env.reset(seed=2)
+assert len(creature_env.maze.creatures) == 70
+
+# Check mazes survive serialization and their hashes identify them
+from core.dungeonworld_serialization import (
+    deserialize_maze,
+    deserialize_mazes,
+    maze_hash,
+    maze_hashes,
+    maze_overlap,
+    serialize_maze,
+    serialize_mazes,
+    unique_maze_indices,
+)
+
+serialized = serialize_maze(creature_maze)
+assert len(serialized) < creature_maze.cells.nbytes
+deserialized_maze = deserialize_maze(serialized)
+assert deserialized_maze == creature_maze
+assert deserialized_maze.creatures == creature_maze.creatures
+assert maze_hash(deserialized_maze) == maze_hash(creature_maze)
+assert maze_hashes(creature_maze)[0] == maze_hash(creature_maze)
+assert maze_hash(creature_maze) != maze_hash(
+    MazeGrid.decode_maze_from_array(encoded_maze)
+)
+
+distinct_mazes = generate_mazes(12, 16, seed=5)
+repeated_mazes = np.concatenate([distinct_mazes, distinct_mazes[:3]])
+repeated_cells, repeated_sprites = deserialize_mazes(serialize_mazes(repeated_mazes))
+assert np.array_equal(repeated_cells, repeated_mazes)
+assert not repeated_sprites.any()
+repeated_hashes = maze_hashes(repeated_mazes)
+assert np.array_equal(
+    unique_maze_indices(repeated_hashes), np.arange(len(distinct_mazes))
+)
+assert np.array_equal(
+    maze_overlap(repeated_hashes, repeated_hashes[:2]),
+    np.isin(np.arange(len(repeated_mazes)), [0, 1, 12, 13]),
+)
+
+# Batch and single hashes agree, including digests ending in zero bytes
+hashed_mazes = generate_mazes(1000, 16, seed=5)
+batch_hashes = maze_hashes(hashed_mazes)
+assert any(digest.tobytes()[-1] == 0 for digest in batch_hashes)
+for i, digest in enumerate(batch_hashes):
+    assert digest == maze_hash(MazeGrid.decode_maze_from_array(hashed_mazes[i]))
+
+# Check environments stepped through the env server match local ones
+import threading
+
+import struct
+
+from envs import env_server
+from envs.env_server import DungeonMazeEnvClient, DungeonMazeEnvServer
+
+with tempfile.TemporaryDirectory() as server_dir:
+    server = DungeonMazeEnvServer(
+        os.path.join(server_dir, "envs.sock"), num_envs=3, grid_size=SIZE
+    )
+    server_thread = threading.Thread(target=server.run)
+    server_thread.start()
+    server.ready.wait()
+    client = DungeonMazeEnvClient(server.path)
+    local_envs = [DungeonMazeEnv(grid_size=SIZE) for _ in range(3)]
+
+    results = client.reset([0, 1, 2], seeds=[124, 5, 6])
+    local_observations = [
+        local_env.reset(seed=seed)[0]
+        for local_env, seed in zip(local_envs, [124, 5, 6])
+    ]
+    for action in solution:
+        results = client.step([2, 0], [action, action])
+        for i, env_id in enumerate([2, 0]):
+            observation, reward, terminated, _, _ = local_envs[env_id].step(action)
+            assert results["reward"][i] == reward
+            assert results["terminated"][i] == terminated
+            for key in observation:
+                assert np.array_equal(results[key][i], observation[key])
+    assert results["terminated"][1]
+
+    try:
+        client.step([7], [0])
+        assert False, "Stepping an unknown env should fail"
+    except RuntimeError:
+        pass
+    # A batch with an unknown action fails without stepping any of its envs
+    direction = server.envs[1].robot_direction
+    try:
+        client.step([1, 2], [0, 9])
+        assert False, "Stepping with an unknown action should fail"
+    except RuntimeError:
+        pass
+    assert server.envs[1].robot_direction == direction
+    # Malformed requests get an error response
+    for request in (b"\x02\x00", struct.pack(env_server.REQUEST_HEADER, 2, 5)):
+        response = server.handle_request(request)
+        assert struct.unpack_from(env_server.RESPONSE_HEADER, response)[0] == (
+            env_server.STATUS_ERROR
+        )
+    # A batch stepping an env that was never reset fails without stepping the others
+    unreset_server = DungeonMazeEnvServer(server.path, num_envs=2, grid_size=SIZE)
+    unreset_server.envs[0].reset(seed=124)
+    direction = unreset_server.envs[0].robot_direction
+    step_records = np.array(
+        [(0, Actions.turn_left), (1, Actions.turn_left)], dtype=env_server.STEP_DTYPE
+    )
+    response = unreset_server.handle_request(
+        struct.pack(env_server.REQUEST_HEADER, env_server.STEP, 2)
+        + step_records.tobytes()
+    )
+    assert struct.unpack_from(env_server.RESPONSE_HEADER, response)[0] == (
+        env_server.STATUS_ERROR
+    )
+    assert unreset_server.envs[0].robot_direction == direction
+    for unsupported_kwargs in (
+        {"observation_mode": "embedding"},
+        {"corridor_view_depth": 2},
+    ):
+        try:
+            DungeonMazeEnvServer(server.path, num_envs=1, **unsupported_kwargs)
+            assert False, "Observations the results cannot hold should be rejected"
+        except ValueError:
+            pass
+    client.close()
+    server.stop()
+    server_thread.join()
+
+# Check importing and stepping the environment does not load pygame or PIL
+import subprocess
+import sys
+
+subprocess.run(
+    [
+        sys.executable,
+        "-c",
+        "import sys\n"
+        "from envs.simple_dungeonworld_env import DungeonMazeEnv\n"
+        "env = DungeonMazeEnv()\n"
+        "env.reset(seed=0)\n"
+        "env.step(0)\n"
+        "assert 'pygame' not in sys.modules and 'PIL' not in sys.modules\n",
+    ],
+    cwd=os.path.dirname(os.path.abspath(__file__)),
+    check=True,
+)
+
+# Check the integer step path agrees with the maze objects, including creatures
+for x, y in np.ndindex(creature_env.maze.cells.shape):
+    expected = creature_env.maze.OBJECT_CAN_OVERLAP[creature_env.maze.cells[x, y]]
+    assert creature_env.maze.can_overlap(x, y) == expected
+    cell = creature_env.maze.get_cell_item(x, y)
+    assert creature_env.maze.can_overlap(x, y) == (cell is None or cell.can_overlap())
+for action in np.random.default_rng(3).integers(0, 3, size=500).tolist():
+    position_in_front = creature_env.get_robot_front_pos()
+    cell_in_front = creature_env.maze.get_cell_item(*position_in_front)
+    moves = action == Actions.move_forwards and (
+        cell_in_front is None or cell_in_front.can_overlap()
+    )
+    observation, reward, terminated, _, _ = creature_env.step(action)
+    if moves:
+        assert np.array_equal(observation["robot_position"], position_in_front)
+    assert reward == (0 if action == Actions.move_forwards and not moves else -1)
+    cell_in_front = creature_env.maze.get_cell_item(*creature_env.get_robot_front_pos())
+    expected_view = EMPTY_VIEW if cell_in_front is None else cell_in_front.image
+    assert np.array_equal(observation["robot_camera_view"], expected_view)
+    if terminated:
+        creature_env.reset()
+
+# Check the shared memory vector env matches the batched env, including autoresets
+from envs.shared_memory_dungeonworld_env import SharedMemoryDungeonMazeEnv
+
+shared_env = SharedMemoryDungeonMazeEnv(
+    3, grid_size=SIZE, num_workers=2, pin_workers=True
+)
+batched_reference = BatchedDungeonMazeEnv(3, grid_size=SIZE)
+shared_observations, _ = shared_env.reset(seed=np.int64(124))
+batched_observations, _ = batched_reference.reset(seed=124)
+assert shared_env.observation_space.contains(shared_observations)
+for key in shared_observations:
+    assert np.array_equal(shared_observations[key], batched_observations[key])
+for action in solution + solution[:5]:
+    actions = np.full(3, action)
+    shared_results = shared_env.step(actions)
+    batched_results = batched_reference.step(actions)
+    for key in shared_results[0]:
+        assert np.array_equal(shared_results[0][key], batched_results[0][key])
+    for shared_result, batched_result in zip(shared_results[1:4], batched_results[1:4]):
+        assert np.array_equal(shared_result, batched_result)
+shared_env.close()
+for unsupported_kwargs in (
+    {"observation_mode": "sprite_id"},
+    {"corridor_view_depth": 3},
+):
+    try:
+        SharedMemoryDungeonMazeEnv(2, grid_size=SIZE, **unsupported_kwargs)
+        assert False, "Observations that are not shared should be rejected"
+    except ValueError:
+        pass
+
+# Check every robot in the multi-robot env moves as it would alone in the same maze,
+# and stays at the target once there
+from envs.multi_robot_dungeonworld_env import MultiRobotDungeonMazeEnv
+
+NUM_ROBOTS = 3
+multi_robot_env = MultiRobotDungeonMazeEnv(
+    NUM_ROBOTS, grid_size=SIZE, creature_counts={"orc": 2, "lizard": 1}
+)
+robot_envs = [
+    DungeonMazeEnv(grid_size=SIZE, creature_counts={"orc": 2, "lizard": 1})
+    for _ in range(NUM_ROBOTS)
+]
+multi_robot_observation, _ = multi_robot_env.reset(seed=124)
+for robot_env in robot_envs:
+    robot_env.reset(seed=124)
+assert np.array_equal(multi_robot_env.maze.cells, robot_envs[0].maze.cells)
+rng = np.random.default_rng(1)
+robot_done = [False] * NUM_ROBOTS
+for t in range(len(solution) + 5):
+    actions = rng.integers(0, 3, size=NUM_ROBOTS)
+    actions[0] = solution[t] if t < len(solution) else Actions.turn_left
+    observation, rewards, terminations, _, _ = multi_robot_env.step(actions)
+    for i, robot_env in enumerate(robot_envs):
+        if robot_done[i]:
+            assert rewards[i] == 0 and terminations[i]
+            continue
+        expected, reward, terminated, _, _ = robot_env.step(actions[i])
+        robot_done[i] = terminated
+        assert np.array_equal(
+            observation["robot_position"][i], expected["robot_position"]
+        )
+        assert observation["robot_direction"][i] == expected["robot_direction"]
+        assert np.array_equal(
+            observation["robot_camera_view"][i], expected["robot_camera_view"]
+        )
+        assert rewards[i] == reward and terminations[i] == terminated
+assert robot_done[0]
+
+# Check the junction graph covers every open cell, and that following its shortest
+# path with corridor macro-actions reaches the target in the fewest primitive steps
+from core.dungeonworld_grid import DIRECTION_VECTORS
+from core.dungeonworld_junctions import NO_NODE
+from envs.corridor_macro_wrapper import CorridorMacroActionWrapper
+
+macro_env = CorridorMacroActionWrapper(DungeonMazeEnv(grid_size=SIZE, oracle_info=True))
+_, macro_info = macro_env.reset(seed=124)
+graph = macro_env.graph
+corridor_cells = {
+    tuple(position)
+    for edge in range(graph.num_edges)
+    for position in graph.nodes[graph.edge_source[edge]]
+    + np.cumsum(DIRECTION_VECTORS[graph.get_edge_path(edge)], axis=0)
+}
+open_cells = set(map(tuple, np.argwhere(macro_env.unwrapped.maze.cells != 1).tolist()))
+assert open_cells == corridor_cells | set(map(tuple, graph.nodes.tolist()))
+assert graph.num_nodes < len(open_cells)
+for edge in range(graph.num_edges):
+    reverse = graph.edge_from[
+        graph.edge_target[edge], (graph.get_edge_path(edge)[-1] + 2) % 4
+    ]
+    assert graph.edge_target[reverse] == graph.edge_source[edge]
+    assert graph.edge_length[reverse] == graph.edge_length[edge]
+
+path = graph.shortest_path(graph.get_node(1, 1), graph.get_node(SIZE - 2, SIZE - 2))
+macro_reward = 0
+for edge in path:
+    _, reward, terminated, _, macro_step_info = macro_env.step(
+        graph.edge_direction[edge]
+    )
+    macro_reward += reward
+assert terminated and len(path) < len(solution)
+assert macro_reward == -macro_info["distance_to_target"]
+
+# Restoring a state from another maze rebuilds the graph before the next macro-action,
+# and macro-actions cannot start in the middle of a corridor
+other_macro_env = CorridorMacroActionWrapper(DungeonMazeEnv(grid_size=SIZE))
+other_macro_env.reset(seed=125)
+macro_env.unwrapped.set_state(other_macro_env.unwrapped.get_state())
+macro_env.step(Directions.south)
+assert np.array_equal(macro_env.graph.nodes, other_macro_env.graph.nodes)
+macro_env.unwrapped.robot_position = next(
+    np.array(cell)
+    for cell in np.argwhere(macro_env.unwrapped.maze.cells != 1).tolist()
+    if macro_env.graph.get_node(*cell) == NO_NODE
+)
+try:
+    macro_env.step(Directions.south)
+    assert False, "A macro-action should not start between junctions"
+except ValueError:
+    pass
+
+# Walling off a cell in place rebuilds the graph at the next macro-action, so the
+# junction next to the new wall becomes a plain corridor cell
+macro_env.reset(seed=124)
+assert macro_env.graph.get_node(5, 4) != NO_NODE
+macro_env.unwrapped.maze.add_cell_item(5, 5, Wall(np.array([5, 5])))
+macro_env.step(Directions.south)
+assert macro_env.graph.get_node(5, 4) == NO_NODE
+
+# Check the line of sight tables against walking each ray cell by cell,
+# and the corridor view observations against the single cell camera view
+from core.dungeonworld_sight import OCCLUDED, CorridorSight
+
+sight_maze = MazeGrid(size=SIZE, empty=False, np_rng=np.random.default_rng(3))
+sight_maze.populate_creatures({"orc": 2, "wingedbat": 2}, seed=3)
+sight = CorridorSight(sight_maze, depth=4)
+for x, y in np.argwhere(sight_maze.cells != 1).tolist():
+    for direction, (dx, dy) in enumerate(DIRECTION_VECTORS.tolist()):
+        expected = []
+        while len(expected) < 4 and (not expected or expected[-1] == 0):
+            expected.append(
+                sight_maze.cells[
+                    x + dx * (len(expected) + 1), y + dy * (len(expected) + 1)
+                ]
+            )
+        expected += [OCCLUDED] * (4 - len(expected))
+        assert sight.get_cell_types(x, y, direction).tolist() == expected
+        views = sight.get_camera_views(x, y, direction)
+        assert np.array_equal(views[0], sight_maze.get_camera_view(x + dx, y + dy))
+
+for corridor_view in ("images", "cells"):
+    corridor_env = DungeonMazeEnv(
+        grid_size=SIZE, corridor_view_depth=3, corridor_view=corridor_view
+    )
+    observation, _ = corridor_env.reset(seed=124)
+    for action in solution:
+        observation, _, _, _, _ = corridor_env.step(action)
+        assert corridor_env.observation_space.contains(observation)
+        front_x, front_y = corridor_env.get_robot_front_pos()
+        if corridor_view == "images":
+            assert np.array_equal(
+                observation["robot_corridor_view"][0], observation["robot_camera_view"]
+            )
+        else:
+            assert (
+                observation["robot_corridor_view"][0]
+                == corridor_env.maze.cells[front_x, front_y]
+            )
+
+# Adding a wall in front of the robot occludes the cells behind it
+corridor_env.reset(seed=124)
+front_x, front_y = corridor_env.get_robot_front_pos()
+assert corridor_env.maze.cells[front_x, front_y] == 0
+corridor_env.maze.add_cell_item(front_x, front_y, Wall(np.array([front_x, front_y])))
+assert corridor_env.get_robot_corridor_view().tolist() == [1, OCCLUDED, OCCLUDED]
+
+# Check the compact observation modes convert back to the image observations
+from core.dungeonworld_features import (
+    camera_views_from_embeddings,
+    get_embedding_table,
+    get_view_table,
+    to_image_observation,
+)
+
+view_table = get_view_table()
+assert np.array_equal(camera_views_from_embeddings(get_embedding_table()), view_table)
+image_env = DungeonMazeEnv(grid_size=SIZE, creature_counts={"orc": 3, "lizard": 3})
+image_observation, _ = image_env.reset(seed=124)
+for observation_mode in ("sprite_id", "embedding"):
+    compact_env = DungeonMazeEnv(
+        grid_size=SIZE,
+        creature_counts={"orc": 3, "lizard": 3},
+        observation_mode=observation_mode,
+    )
+    compact_observations = [compact_env.reset(seed=124)[0]]
+    image_observations = [image_env.reset(seed=124)[0]]
+    for action in solution:
+        compact_observations.append(compact_env.step(action)[0])
+        image_observations.append(image_env.step(action)[0])
+    for compact_observation, image_observation in zip(
+        compact_observations, image_observations
+    ):
+        assert compact_env.observation_space.contains(compact_observation)
+        assert "robot_camera_view" not in compact_observation
+        converted = to_image_observation(compact_observation)
+        for key in image_observation:
+            assert np.array_equal(converted[key], image_observation[key])
+    # Stacked observations convert at once
+    stacked = {
+        key: np.stack([observation[key] for observation in compact_observations])
+        for key in compact_observations[0]
+    }
+    assert np.array_equal(
+        to_image_observation(stacked)["robot_camera_view"],
+        np.stack(
+            [observation["robot_camera_view"] for observation in image_observations]
+        ),
+    )
+
+# Check benchmark comparisons flag regressions in either direction, including from zero
+import contextlib
+import io
+
+from benchmarks import compare_results
+
+baseline_results = {
+    "step_throughput": {"8": 100.0, "16": 100.0},
+    "reset_latency": {"8": 1.0, "16": 0.0},
+}
+with contextlib.redirect_stdout(io.StringIO()):
+    regressions = compare_results(
+        {
+            "step_throughput": {"8": 50.0, "16": 110.0},
+            "reset_latency": {"8": 0.5, "16": 0.1},
+        },
+        baseline_results,
+        tolerance=0.2,
+    )
+    unchanged = compare_results(baseline_results, baseline_results, tolerance=0.2)
+assert [(name, size) for name, size, _, _ in regressions] == [
+    ("step_throughput", "8"),
+    ("reset_latency", "16"),
+]
+assert unchanged == []